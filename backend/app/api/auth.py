@@ -1,43 +1,61 @@
 # backend/app/api/auth.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.deps import get_async_db
 from app.db.models import User
 from app.schemas.auth import SignupRequest, LoginRequest, TokenResponse
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import (
+    HashingBusy,
+    create_access_token,
+    hash_password_async,
+    verify_password_async,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in attempts in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+async def _find_user(db: AsyncSession, email: str) -> User | None:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
 @router.post("/signup")
-def signup(payload: SignupRequest, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == payload.email).first():
+async def signup(payload: SignupRequest, db: AsyncSession = Depends(get_async_db)):
+    if await _find_user(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    try:
+        password_hash = await hash_password_async(payload.password)
+    except HashingBusy:
+        raise _busy()
+
     user = User(
         email=payload.email,
-        password_hash=hash_password(payload.password)
+        password_hash=password_hash
     )
     db.add(user)
-    db.commit()
+    await db.commit()
     return {"status": "ok"}
 
 @router.post("/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _find_user(db, payload.email)
+    try:
+        valid = user is not None and await verify_password_async(payload.password, user.password_hash)
+    except HashingBusy:
+        raise _busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token(user.id)
+    token = create_access_token(user.id, user.email, user.created_at)
     return {"access_token": token}
 
-
 from app.core.deps import get_current_user
 
 @router.get("/me")
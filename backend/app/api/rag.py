@@ -1,19 +1,39 @@
 # backend/app/api/rag.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-import uuid
+import json
+import logging
 import time
 from app.core.metrics import metrics
+from app.core.tracing import current_trace_id, log_event, new_trace_id, record_stage, stage
 from app.core.config import settings
-from app.rag.retrieve import retrieve
-from app.rag.llm import generate_answer
-from app.core.deps import get_db, get_current_user
-from app.db.models import User, ChatSession
-from app.db.chat_memory import save_message, load_conversation, create_session
+from app.rag.engine import get_engine
+from app.rag.answer_cache import answer_cache, history_key
+from app.rag.llm import generate_answer_async, stream_answer
+from app.rag.query_cache import encode_query
+from app.core.deps import AuthUser, get_db, get_async_db, get_current_user
+from app.core.executors import retrieval_executor, run_in_executor
+from app.db.session import AsyncSessionLocal
+from app.db.models import ChatSession, IngestJob
+from app.db.chat_memory import (
+    create_session,
+    load_messages_page,
+    get_owned_session_async,
+    load_history_async,
+    save_exchange_async,
+)
+from app.rag.ingest_jobs import (
+    UploadTooLarge,
+    job_dict,
+    store_uploads,
+    submit as submit_ingest_job,
+    worker_id as ingest_worker_id,
+)
+from app.rag.summary import history_window, schedule_summary
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.models import ChatMessage  # Add this line
-from sqlalchemy import asc
-from pydantic import BaseModel
 from datetime import datetime
 
 
@@ -27,21 +47,153 @@ class AskRequest(BaseModel):
     query: str = Field(..., min_length=3, max_length=500)
     session_id: int
     top_k: int = 5
+    # ANN search knobs (ignored by the flat index); None = server defaults
+    ef_search: int | None = Field(None, ge=1, le=4096)
+    nprobe: int | None = Field(None, ge=1, le=4096)
+
+class BatchRetrieveRequest(BaseModel):
+    queries: list[str] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(5, ge=1, le=50)
+    ef_search: int | None = Field(None, ge=1, le=4096)
+    nprobe: int | None = Field(None, ge=1, le=4096)
 
 class MessageItem(BaseModel):
+    id: int | None = None
     role: str
     content: str
     created_at: datetime | None = None
 
 @router.get("/metrics")
-def rag_metrics():
-    return metrics
+def rag_metrics(request: Request, format: str | None = None):
+    """
+    Counters plus per-stage latency (count, mean, p50/p95/p99, max) as
+    JSON, or the Prometheus text format with ``?format=prometheus`` or
+    when a scraper asks for text/plain.
+    """
+    accept = request.headers.get("accept", "")
+    if format == "prometheus" or (format is None and "text/plain" in accept and "text/html" not in accept):
+        return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+    counters = metrics.counters()
+    lookups = counters["answer_cache_hits"] + counters["answer_cache_misses"]
+    return {
+        **counters,
+        "answer_cache_entries": len(answer_cache),
+        "answer_cache_hit_rate": round(counters["answer_cache_hits"] / lookups, 4) if lookups else 0.0,
+        "prompt_tokens_mean": round(counters["prompt_tokens_total"] / counters["prompt_requests"], 1)
+        if counters["prompt_requests"] else 0.0,
+        "stages": metrics.stages(),
+    }
+
+
+@router.post("/retrieve/batch")
+async def retrieve_batch(
+    request: BatchRetrieveRequest,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Retrieve context chunks for many queries in one call (offline
+    evaluation, cache pre-warming). No LLM call, no session writes.
+    """
+    results = await run_in_executor(
+        retrieval_executor,
+        get_engine().retrieve_many,
+        request.queries,
+        request.top_k,
+        ef_search=request.ef_search,
+        nprobe=request.nprobe,
+    )
+    return {
+        "results": [
+            {"query": query, "chunks": chunks}
+            for query, chunks in zip(request.queries, results)
+        ]
+    }
+
+
+def require_ingest_user(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
+    """
+    Authenticated user allowed to change the corpus. Signup is open, so
+    only accounts listed in INGEST_ADMIN_EMAILS qualify; none by default.
+    """
+    allowed = {e.strip().lower() for e in settings.INGEST_ADMIN_EMAILS.split(",") if e.strip()}
+    if current_user.email.lower() not in allowed:
+        raise HTTPException(status_code=403, detail="Not allowed to ingest documents")
+    return current_user
+
+
+@router.post("/ingest", status_code=202)
+async def start_ingest(
+    response: Response,
+    files: list[UploadFile] = File(default=[]),
+    force: bool = Form(False),
+    replace: bool = Form(False),
+    current_user: AuthUser = Depends(require_ingest_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Add or replace source documents (.pdf books, .json doc lists) and
+    re-ingest in the background. A file named like an existing source is
+    refused with 409 unless ``replace`` is set; with no files the sources
+    on disk are simply re-scanned.
+    Returns the job at once; poll ``Location`` for its progress. Queries
+    keep using the current index until the new version is swapped in.
+    """
+    # Starlette has spooled each part to a temp file; it is copied to its
+    # destination block by block, off the event loop
+    uploads = [(upload.filename, upload.file) for upload in files]
+    try:
+        stored = await run_in_threadpool(store_uploads, uploads, replace)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job = IngestJob(user_id=current_user.id, files=json.dumps(stored), force=force, worker=ingest_worker_id())
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    submit_ingest_job(job.id)
+
+    response.headers["Location"] = f"/rag/ingest/{job.id}"
+    return job_dict(job)
+
+
+@router.get("/ingest")
+def list_ingest_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: AuthUser = Depends(require_ingest_user),
+    db: Session = Depends(get_db),
+):
+    """The user's most recent ingest jobs, newest first."""
+    jobs = db.query(IngestJob).filter(
+        IngestJob.user_id == current_user.id
+    ).order_by(IngestJob.id.desc()).limit(limit).all()
+    return [job_dict(job) for job in jobs]
+
+
+@router.get("/ingest/{job_id}")
+def get_ingest_job(
+    job_id: int,
+    current_user: AuthUser = Depends(require_ingest_user),
+    db: Session = Depends(get_db),
+):
+    """Status, stage and progress of one ingest job; on success the published index version."""
+    job = db.query(IngestJob).filter(
+        IngestJob.id == job_id,
+        IngestJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingest job not found or access denied")
+    return job_dict(job)
 
 
 @router.post("/create_session")
 def create_new_session(
     request: CreateSessionRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     session = create_session(db, current_user.id, request.title)
@@ -51,7 +203,7 @@ def create_new_session(
 def rename_session(
     session_id: int,
     request: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     title = request.get("title")
@@ -74,7 +226,7 @@ def rename_session(
 
 @router.get("/sessions")
 def list_sessions(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     sessions = (
@@ -93,48 +245,109 @@ def list_sessions(
         for s in sessions
     ]
 
-@router.post("/ask")
-def rag_ask(
-    request: AskRequest,
-    current_user: User = Depends(get_current_user),  # ← Added dependency
-    db: Session = Depends(get_db)
-):
-    trace_id = str(uuid.uuid4())
-    start_time = time.time()
-    metrics["total"] += 1
+LOW_CONTEXT_ANSWER = "I don’t have enough reliable context to answer this question."
+
 
+async def _prepare_ask(request: AskRequest, current_user: AuthUser, db: AsyncSession):
+    """
+    Session check, history load, retrieval and guardrails shared by /ask
+    and /ask/stream. Returns (conversation, summary, good_chunks): the
+    recent messages not yet covered by the rolling summary, the summary,
+    and the context chunks - None when there is not enough reliable
+    context to answer.
+    """
     # --- Load conversation if session_id provided ---
     conversation = []
+    summary = None
     if request.session_id is not None:
-        # Verify session ownership
-        session = db.query(ChatSession).filter(
-            ChatSession.id == request.session_id,
-            ChatSession.user_id == current_user.id
-        ).first()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found or access denied")
-        
-        conversation = load_conversation(db, request.session_id)
-        conversation = conversation[-20:]  # Keep only last 10 full exchanges (user + assistant)
-
-    # 1. Retrieve
-    results = retrieve(request.query, request.top_k)
+        with stage("history"):
+            # Verify session ownership
+            session = await get_owned_session_async(db, request.session_id, current_user.id)
+            if not session:
+                raise HTTPException(status_code=404, detail="Session not found or access denied")
+
+            # Summary + bounded tail: constant read cost however long the session
+            conversation = await load_history_async(db, session, history_window())
+            summary = session.summary
+
+    # 1. Retrieve (CPU-bound: runs on the retrieval executor, not the event loop)
+    with stage("retrieve"):
+        results = await run_in_executor(
+            retrieval_executor,
+            get_engine().retrieve,
+            request.query,
+            request.top_k,
+            ef_search=request.ef_search,
+            nprobe=request.nprobe,
+        )
     if not results:
-        metrics["low_context"] += 1
-        return {
-            "answer": "I don’t have enough reliable context to answer this question.",
-            "sources": [],
-            "status": "low_context",
-            "trace_id": trace_id,
-            "session_id": request.session_id
-        }
+        metrics.inc("low_context")
+        return conversation, summary, None
 
     # 2. Guardrails
     good_chunks = [r for r in results if r.get("score", 0) >= settings.SIMILARITY_THRESHOLD]
     if len(good_chunks) < settings.MIN_CONTEXT_CHUNKS:
-        metrics["low_context"] += 1
+        metrics.inc("low_context")
+        return conversation, summary, None
+
+    return conversation, summary, good_chunks
+
+
+async def _answer_cache_lookup(request: AskRequest, conversation: list[dict], summary: str | None, good_chunks: list[dict]):
+    """
+    Look the question up in the answer cache. Returns (cached answer or
+    None, key) where key holds what ``_answer_cache_store`` needs on a miss.
+    Encoding the question (on a query-cache miss) and the similarity scan
+    are CPU work, so they run on the retrieval executor.
+    """
+    return await run_in_executor(
+        retrieval_executor, _lookup_answer, request, conversation, summary, good_chunks
+    )
+
+
+def _lookup_answer(request: AskRequest, conversation: list[dict], summary: str | None, good_chunks: list[dict]):
+    key = {
+        "query_vec": encode_query(request.query)[0],  # usually cached by retrieval
+        "chunk_ids": [r["chunk_id"] for r in good_chunks],
+        "history": history_key(conversation, summary),
+        "generation": answer_cache.generation,
+    }
+    cached = answer_cache.get(key["query_vec"], key["chunk_ids"], key["history"])
+    return cached, key
+
+
+def _answer_cache_store(key: dict, answer: str, llm_seconds: float):
+    if answer:
+        answer_cache.set(answer=answer, llm_seconds=llm_seconds, **key)
+
+
+def _sources(chunks: list[dict]) -> list[dict]:
+    return [
+        {
+            "doc_id": r["doc_id"],
+            "title": r["title"],
+            "chunk_id": r["chunk_id"],
+            "score": r["score"],
+        }
+        for r in chunks
+    ]
+
+
+@router.post("/ask")
+async def rag_ask(
+    request: AskRequest,
+    current_user: AuthUser = Depends(get_current_user),  # ← Added dependency
+    db: AsyncSession = Depends(get_async_db)
+):
+    trace_id = current_trace_id() or new_trace_id()
+    start_time = time.time()
+    metrics.inc("total")
+
+    conversation, summary, good_chunks = await _prepare_ask(request, current_user, db)
+    if good_chunks is None:
+        record_stage("request", time.time() - start_time, status="low_context")
         return {
-            "answer": "I don’t have enough reliable context to answer this question.",
+            "answer": LOW_CONTEXT_ANSWER,
             "sources": [],
             "status": "low_context",
             "trace_id": trace_id,
@@ -144,47 +357,170 @@ def rag_ask(
     # 3. Build context for LLM
     context_chunks = [r["text"] for r in good_chunks]
 
-    # 4. Generate answer
-    answer = generate_answer(context_chunks, request.query, conversation)
-
-    metrics["ok"] += 1
-    latency = round(time.time() - start_time, 3)
+    # 4. Generate answer, unless a near-identical question was already
+    # answered from the same chunks and history
+    cached, cache_key = await _answer_cache_lookup(request, conversation, summary, good_chunks)
+    usage = {}
+    if cached is not None:
+        answer = cached.answer
+    else:
+        llm_start = time.time()
+        answer = await generate_answer_async(context_chunks, request.query, conversation, usage, summary)
+        _answer_cache_store(cache_key, answer, time.time() - llm_start)
 
     # --- Save messages to session if provided ---
     if request.session_id is not None:
-        save_message(db, request.session_id, "user", request.query)
-        save_message(db, request.session_id, "assistant", answer)
+        with stage("db_write"):
+            await save_exchange_async(db, request.session_id, request.query, answer)
+        schedule_summary(request.session_id)
+
+    metrics.inc("ok")
+    latency = round(time.time() - start_time, 3)
+    record_stage("request", latency, status="ok")
 
     # Observability logging
-    print({
-        "trace_id": trace_id,
-        "query": request.query,
-        "top_scores": [r["score"] for r in good_chunks[:3]],
-        "latency": latency,
-        "status": "ok",
-        "session_id": request.session_id
-    })
+    log_event(
+        "ask",
+        query=request.query,
+        top_scores=[r["score"] for r in good_chunks[:3]],
+        latency=latency,
+        status="ok",
+        cached=cached is not None,
+        prompt_tokens=usage.get("prompt_tokens"),
+        session_id=request.session_id,
+    )
 
     return {
         "answer": answer,
-        "sources": [
-            {
-                "doc_id": r["doc_id"],
-                "title": r["title"],
-                "chunk_id": r["chunk_id"],
-                "score": r["score"],
-            }
-            for r in good_chunks
-        ],
+        "sources": _sources(good_chunks),
         "status": "ok",
+        "cached": cached is not None,
         "trace_id": trace_id,
         "session_id": request.session_id
     }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _persist_exchange(session_id: int, query: str, answer: str):
+    # The request-scoped session may already be closed once streaming
+    # starts, so the final write uses its own.
+    with stage("db_write"):
+        async with AsyncSessionLocal() as db:
+            await save_exchange_async(db, session_id, query, answer)
+    schedule_summary(session_id)
+
+
+async def _stream_events(
+    request: AskRequest,
+    trace_id: str,
+    start_time: float,
+    conversation: list[dict],
+    summary: str | None,
+    good_chunks: list[dict] | None,
+):
+    yield _sse("sources", {
+        "trace_id": trace_id,
+        "session_id": request.session_id,
+        "sources": _sources(good_chunks or []),
+    })
+
+    if good_chunks is None:
+        yield _sse("token", {"text": LOW_CONTEXT_ANSWER})
+        yield _sse("done", {
+            "status": "low_context",
+            "trace_id": trace_id,
+            "session_id": request.session_id,
+        })
+        return
+
+    cached, cache_key = await _answer_cache_lookup(request, conversation, summary, good_chunks)
+    usage = {}
+    parts = []
+    ttft = None
+    if cached is not None:
+        ttft = round(time.time() - start_time, 3)
+        parts.append(cached.answer)
+        yield _sse("token", {"text": cached.answer})
+    else:
+        llm_start = time.time()
+        try:
+            async for delta in stream_answer([r["text"] for r in good_chunks], request.query, conversation, usage, summary):
+                if ttft is None:
+                    ttft = round(time.time() - start_time, 3)
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+        except Exception as e:
+            metrics.inc("stream_errors")
+            log_event("stream_error", level=logging.WARNING, error=str(e), session_id=request.session_id)
+            yield _sse("error", {"detail": "Answer generation failed", "trace_id": trace_id})
+            return
+        _answer_cache_store(cache_key, "".join(parts).strip(), time.time() - llm_start)
+
+    answer = "".join(parts).strip()
+
+    # --- Persist the completed exchange ---
+    if request.session_id is not None:
+        await _persist_exchange(request.session_id, request.query, answer)
+
+    latency = round(time.time() - start_time, 3)
+    metrics.inc("ok")
+    record_stage("ttft", ttft or latency)
+    record_stage("request", latency, status="ok", stream=True)
+
+    log_event(
+        "ask",
+        query=request.query,
+        top_scores=[r["score"] for r in good_chunks[:3]],
+        ttft=ttft,
+        latency=latency,
+        status="ok",
+        cached=cached is not None,
+        prompt_tokens=usage.get("prompt_tokens"),
+        stream=True,
+        session_id=request.session_id,
+    )
+
+    yield _sse("done", {
+        "status": "ok",
+        "cached": cached is not None,
+        "trace_id": trace_id,
+        "session_id": request.session_id,
+        "ttft": ttft,
+        "latency": latency,
+    })
+
+
+@router.post("/ask/stream")
+async def rag_ask_stream(
+    request: AskRequest,
+    current_user: AuthUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Same as /ask, streamed as Server-Sent Events:
+    `sources` first, then one `token` event per text delta, then `done`
+    (with time-to-first-token and total latency) or `error`.
+    """
+    trace_id = current_trace_id() or new_trace_id()
+    start_time = time.time()
+    metrics.inc("total")
+    metrics.inc("stream_requests")
+
+    conversation, summary, good_chunks = await _prepare_ask(request, current_user, db)
+
+    return StreamingResponse(
+        _stream_events(request, trace_id, start_time, conversation, summary, good_chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
     
 @router.delete("/session/{session_id}")
 def delete_session(
     session_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     session = db.query(ChatSession).filter(
@@ -206,12 +542,19 @@ def delete_session(
 @router.get("/session/{session_id}/messages")
 def get_session_messages(
     session_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    before: int | None = Query(None, description="Return messages older than this message id"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Retrieve all messages for a specific session, in chronological order.
+    Retrieve the newest ``limit`` messages of a session (or those before
+    message ``before``), in chronological order.
     Used by frontend to load persistent conversation history.
+
+    ``X-Has-More: true`` means older messages exist; request them with
+    ``before`` set to the id of the first message returned.
     """
     # Verify session exists and belongs to current user
     session = db.query(ChatSession).filter(
@@ -222,16 +565,12 @@ def get_session_messages(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found or access denied")
 
-    # Load messages ordered by creation time
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(asc(ChatMessage.created_at))
-        .all()
-    )
+    messages, has_more = load_messages_page(db, session_id, before, limit)
+    response.headers["X-Has-More"] = "true" if has_more else "false"
 
     return [
         MessageItem(
+            id=msg.id,
             role=msg.role,
             content=msg.content,
             created_at=msg.created_at
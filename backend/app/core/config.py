@@ -4,17 +4,90 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 DOCS_PATH = os.path.join(BASE_DIR, "app/data/docs")
-VECTOR_DB_PATH = os.path.join(BASE_DIR, "app/data/vector_store.index")
-VECTOR_DB_META_PATH = os.path.join(BASE_DIR, "app/data/vector_store_meta.pkl")
+# Versioned vector store (index, chunk store, BM25, embeddings, manifest);
+# see app.rag.index_store
+INDEX_DIR = os.path.join(BASE_DIR, "app/data/index")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 class Settings(BaseSettings):
     JWT_SECRET: str
+    LOG_LEVEL: str = "INFO"  # structured request/stage logs
     JWT_EXPIRES_MIN: int = 60
-    SIMILARITY_THRESHOLD: float = 0.75
+    AUTH_CACHE_SIZE: int = 4096  # users kept by get_current_user; 0 = always query
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    # Build the current user from token claims alone (no cache, no DB). A
+    # deleted account then stays valid until its tokens expire.
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+
+    # Password hashing (signup/login), on its own pool off the request threads
+    BCRYPT_ROUNDS: int = 12  # cost for new hashes; existing hashes keep theirs
+    HASH_WORKERS: int = 2
+    HASH_QUEUE_LIMIT: int = 32  # hashes waiting beyond HASH_WORKERS before 503
+    SIMILARITY_THRESHOLD: float = 0.35  # minimum cosine similarity of a context chunk
     MIN_CONTEXT_CHUNKS: int = 2
 
+    # Database. PostgreSQL (postgresql://...) needs psycopg2 and asyncpg installed.
+    DATABASE_URL: str = "sqlite:///./app.db"
+    DB_POOL_SIZE: int = 10  # server databases only; SQLite uses its own pooling
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; drop connections older than this
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # wait this long for a write lock before "database is locked"
+
+    # Ingestion
+    INGEST_WORKERS: int = 0  # PDF extraction processes; 0 = one per CPU
+    EMBED_BATCH_SIZE: int = 64  # chunks per encode() call / index.add()
+    INDEX_KEEP_VERSIONS: int = 2  # published store versions kept on disk, the live one included
+    INDEX_CHECK_SECONDS: float = 5.0  # how often a process looks for a newer version; 0 = never
+    INGEST_MAX_UPLOAD_MB: int = 50  # per uploaded file
+    INGEST_ADMIN_EMAILS: str = ""  # comma-separated accounts allowed to ingest; empty = ingestion disabled
+
+    # FAISS index: flat | hnsw | ivf | ivfpq
+    INDEX_TYPE: str = "flat"
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64  # default; overridable per request
+    IVF_NLIST: int = 0  # 0 = 4 * sqrt(chunks)
+    IVF_NPROBE: int = 8  # default; overridable per request
+    PQ_M: int = 16  # sub-quantizers; must divide the embedding dim
+    PQ_NBITS: int = 8
+    INDEX_MMAP: bool = True  # map the index file read-only instead of copying it into each process
+
+    # Hybrid retrieval
+    RETRIEVAL_CANDIDATES: int = 20  # per retriever, before fusion
+    FUSION_METHOD: str = "rrf"  # rrf | weighted
+    FUSION_ALPHA: float = 0.5  # weight of the dense (cosine) ranking
+    RRF_K: int = 60
+
+    # Request path
+    RETRIEVAL_WORKERS: int = 4  # threads for encode/FAISS/BM25 off the event loop
+    # torch/FAISS threads per server process under gunicorn; 0 = CPUs / workers
+    WORKER_COMPUTE_THREADS: int = 0
+
+    # Query embedding cache
+    QUERY_CACHE_SIZE: int = 2048
+    QUERY_CACHE_TTL_SECONDS: int = 24 * 3600  # 0 = never expire
+    QUERY_CACHE_PATH: str = ""  # SQLite file for the persistent tier; empty = memory only
+    QUERY_CACHE_DISK_ROWS: int = 100_000  # LRU cap of the persistent tier (which shares the TTL); 0 = unbounded
+
+    # Prompt assembly (tokens counted with the embedding model's tokenizer)
+    PROMPT_TOKEN_BUDGET: int = 4096  # whole prompt sent to the LLM
+    PROMPT_HISTORY_TOKENS: int = 1024  # cap on conversation history
+    PROMPT_MIN_CHUNK_TOKENS: int = 48  # smaller leftovers are dropped, not truncated
+
+    # Rolling conversation summary
+    SUMMARY_RECENT_MESSAGES: int = 6  # newest messages always sent verbatim
+    SUMMARY_TRIGGER_MESSAGES: int = 8  # fold once this many more are waiting; 0 = off
+    HISTORY_MESSAGES: int = 20  # verbatim history sent while summaries are off
+
+    # Answer cache (/rag/ask)
+    ANSWER_CACHE_SIZE: int = 1024  # 0 = disabled
+    ANSWER_CACHE_TTL_SECONDS: int = 3600  # 0 = never expire
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # minimum cosine between the two questions
+
 
     GROQ_API_KEY: str
+    GROQ_BASE_URL: str | None = None  # e.g. a local stub for load tests
 
     model_config = SettingsConfigDict(
         env_file=".env",
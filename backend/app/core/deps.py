@@ -1,10 +1,16 @@
 #backend/app/core/deps.py
+from dataclasses import dataclass
+from datetime import datetime
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.metrics import metrics
+from app.core.tracing import stage
+from app.db.session import SessionLocal, AsyncSessionLocal
 from app.db.models import User
 
 security = HTTPBearer()
@@ -16,22 +22,92 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@dataclass(frozen=True)
+class AuthUser:
+    """Immutable snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    created_at: datetime | None = None
+
+
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS or None)
+
+
+def invalidate_user(user_id: int):
+    """Drop a cached user; the next request reloads it from the database."""
+    _user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_changed(mapper, connection, target):
+    # Any ORM change to an account (email, password, deletion) evicts it
+    invalidate_user(target.id)
+
+
+def _load_user(user_id: int) -> AuthUser | None:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        return AuthUser(id=user.id, email=user.email, created_at=user.created_at)
+    finally:
+        db.close()
+
+
+def _user_from_claims(user_id: int, payload: dict) -> AuthUser | None:
+    if "email" not in payload:
+        return None  # token issued before claims were added
+    created_at = payload.get("created_at")
+    return AuthUser(
+        id=user_id,
+        email=payload["email"],
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    token = credentials.credentials
+) -> AuthUser:
+    """
+    Resolve the bearer token to a user. Token claims are used directly
+    when AUTH_TRUST_TOKEN_CLAIMS is set; otherwise users come from a short
+    TTL cache, with a database query only on a miss.
+    """
+    with stage("auth"):
+        return await _authenticate(credentials.credentials)
+
+
+async def _authenticate(token: str) -> AuthUser:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
         user_id = int(payload.get("sub"))
-    except (JWTError, ValueError):
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        user = _user_from_claims(user_id, payload)
+        if user is not None:
+            return user
+
+    user = _user_cache.get(user_id)
+    if user is not None:
+        metrics.inc("auth_cache_hits")
+        return user
+
+    metrics.inc("auth_cache_misses")
+    user = await run_in_threadpool(_load_user, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    _user_cache.set(user_id, user)
     return user
@@ -0,0 +1,38 @@
+# backend/app/core/executors.py
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.core.config import settings
+
+# CPU-bound retrieval (query encode, FAISS, BM25) gets its own small pool so
+# it can neither starve nor be starved by the shared request threadpool.
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=settings.RETRIEVAL_WORKERS,
+    thread_name_prefix="retrieval",
+)
+
+# Background conversation summarization; one thread keeps LLM usage and
+# SQLite write contention from summaries bounded.
+summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+
+# Background ingest jobs run one at a time; the store's own lock also
+# serializes them against other server processes.
+ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+# bcrypt is deliberately slow; a burst of logins queues here instead of
+# occupying the threadpool that sync endpoints run on.
+hash_executor = ThreadPoolExecutor(
+    max_workers=settings.HASH_WORKERS,
+    thread_name_prefix="hash",
+)
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    """
+    Await ``fn(*args, **kwargs)`` on ``executor`` without blocking the event
+    loop. Context variables (the request's trace id) carry over.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(ctx.run, fn, *args, **kwargs))
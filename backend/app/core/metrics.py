@@ -1,5 +1,165 @@
-metrics = {
-    "total": 0,
-    "ok": 0,
-    "low_context": 0
-}
+# backend/app/core/metrics.py
+"""
+Process-wide instrumentation: counters and latency histograms.
+
+Every update takes a lock, so request threads, executor workers and the
+event loop can record concurrently. Histograms keep cumulative buckets
+(for Prometheus) plus a window of recent samples for p50/p95/p99.
+"""
+import threading
+from bisect import bisect_left
+from collections import deque
+import numpy as np
+
+PREFIX = "socrates"
+
+# Seconds; spans a cached auth check up to a slow LLM call
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+PERCENTILE_WINDOW = 2048  # most recent samples per histogram
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS, window: int = PERCENTILE_WINDOW):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = np.fromiter(self._recent, dtype=np.float64)
+            count, total, peak = self.count, self.sum, self.max
+        if not count:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+        return {
+            "count": count,
+            "mean": round(total / count, 6),
+            "p50": round(float(p50), 6),
+            "p95": round(float(p95), 6),
+            "p99": round(float(p99), 6),
+            "max": round(peak, 6),
+        }
+
+    def cumulative(self) -> tuple[list[tuple[str, int]], int, float]:
+        """(le, cumulative count) pairs including +Inf, plus count and sum."""
+        with self._lock:
+            counts, count, total = list(self._counts), self.count, self.sum
+        running, out = 0, []
+        for le, n in zip([*map(str, self.buckets), "+Inf"], counts):
+            running += n
+            out.append((le, running))
+        return out, count, total
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and per-stage latency histograms.
+
+    ``metrics["name"]`` reads a counter; writes go through ``inc`` and
+    ``set_max`` so they are atomic.
+    """
+
+    def __init__(self, counters: dict[str, float], gauges: tuple[str, ...] = ()):
+        self._values = dict(counters)
+        self._gauges = set(gauges)
+        self._stages: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> float:
+        with self._lock:
+            return self._values[name]
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def set_max(self, name: str, value: float):
+        with self._lock:
+            self._values[name] = max(self._values.get(name, 0), value)
+
+    def observe(self, stage: str, seconds: float):
+        hist = self._stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._stages.setdefault(stage, Histogram())
+        hist.observe(seconds)
+
+    def counters(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def stages(self) -> dict[str, dict]:
+        with self._lock:
+            stages = dict(self._stages)
+        return {name: hist.summary() for name, hist in sorted(stages.items())}
+
+    def prometheus(self) -> str:
+        """Text exposition format (version 0.0.4)."""
+        lines = []
+        for name, value in sorted(self.counters().items()):
+            kind = "gauge" if name in self._gauges else "counter"
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            lines.append(f"{PREFIX}_{name} {value}")
+
+        family = f"{PREFIX}_stage_seconds"
+        lines.append(f"# HELP {family} Latency of each request stage")
+        lines.append(f"# TYPE {family} histogram")
+        with self._lock:
+            stages = dict(self._stages)
+        for stage, hist in sorted(stages.items()):
+            buckets, count, total = hist.cumulative()
+            for le, n in buckets:
+                lines.append(f'{family}_bucket{{stage="{stage}",le="{le}"}} {n}')
+            lines.append(f'{family}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{family}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(
+    {
+        "total": 0,
+        "ok": 0,
+        "low_context": 0,
+        "auth_cache_hits": 0,
+        "auth_cache_misses": 0,
+        "hash_requests": 0,
+        "hash_rejected": 0,  # turned away with 503 while the pool was full
+        "query_cache_hits": 0,
+        "query_cache_disk_hits": 0,
+        "query_cache_disk_errors": 0,
+        "query_cache_misses": 0,
+        "answer_cache_hits": 0,
+        "answer_cache_misses": 0,
+        # LLM time the hits would have cost, estimated from the cached calls
+        "answer_cache_saved_llm_seconds_total": 0.0,
+        "prompt_requests": 0,
+        "prompt_tokens_total": 0,
+        "prompt_context_tokens_total": 0,
+        "prompt_history_tokens_total": 0,
+        "prompt_tokens_max": 0,
+        "prompt_truncated": 0,  # prompts where context or history was cut
+        "summaries_written": 0,
+        "summary_errors": 0,
+        "stream_requests": 0,
+        "stream_errors": 0,
+        "ingest_jobs_succeeded": 0,
+        "ingest_jobs_failed": 0,
+        "index_reloads": 0,  # engine swapped to a newer store version
+    },
+    gauges=("prompt_tokens_max",),
+)
@@ -1,21 +1,70 @@
 #backend/app/core/security.py
+import threading
+import time
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.executors import hash_executor, run_in_executor
+from app.core.metrics import metrics
+from app.core.tracing import record_stage
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 ALGORITHM = "HS256"
 
+# Running + queued hashes; beyond this new ones are refused
+_hash_slots = threading.BoundedSemaphore(settings.HASH_WORKERS + settings.HASH_QUEUE_LIMIT)
+
+
+class HashingBusy(RuntimeError):
+    """The password hashing pool is saturated; retry later."""
+
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
-def create_access_token(user_id: int):
+
+async def _run_hash(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        metrics.inc("hash_rejected")
+        raise HashingBusy("Too many concurrent password operations")
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            record_stage("hash_wait", started - submitted)
+            record_stage("hash", time.perf_counter() - started)
+
+    try:
+        metrics.inc("hash_requests")
+        return await run_in_executor(hash_executor, timed)
+    finally:
+        _hash_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    """hash_password() on the bounded hash pool; raises HashingBusy when full."""
+    return await _run_hash(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """verify_password() on the bounded hash pool; raises HashingBusy when full."""
+    return await _run_hash(verify_password, password, hashed)
+
+
+def create_access_token(user_id: int, email: str | None = None, created_at: datetime | None = None):
     payload = {
         "sub": str(user_id),
         "exp": datetime.utcnow() + timedelta(minutes=settings.JWT_EXPIRES_MIN)
     }
+    # Optional profile claims; with AUTH_TRUST_TOKEN_CLAIMS they replace
+    # the per-request user lookup
+    if email is not None:
+        payload["email"] = email
+    if created_at is not None:
+        payload["created_at"] = created_at.isoformat()
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=ALGORITHM)
@@ -0,0 +1,91 @@
+# backend/app/core/tracing.py
+"""
+Trace ids, stage timers and structured (JSON line) logs.
+
+Each HTTP request gets a trace id, taken from an ``X-Trace-Id`` request
+header or generated, and returned in the response header. It lives in a
+context variable, so every log line and stage timing for the request
+carries it. That includes work handed to executors through
+app.core.executors.run_in_executor, which copies the context.
+"""
+import json
+import logging
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_trace_id: ContextVar[str | None] = ContextVar("trace_id", default=None)
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+logger = logging.getLogger("socrates")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(settings.LOG_LEVEL.upper())
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+def new_trace_id() -> str:
+    """Start a fresh trace in the current context and return its id."""
+    trace_id = str(uuid.uuid4())
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    """One JSON log line tagged with the current trace id."""
+    if logger.isEnabledFor(level):
+        record = {"ts": round(time.time(), 3), "event": event, "trace_id": current_trace_id(), **fields}
+        logger.log(level, json.dumps(record, default=str, ensure_ascii=False))
+
+
+def record_stage(name: str, seconds: float, **fields):
+    """Add a measured duration to the ``name`` histogram and log it."""
+    metrics.observe(name, seconds)
+    log_event("stage", stage=name, seconds=round(seconds, 6), **fields)
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Time the enclosed block as request stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start, **fields)
+
+
+class TraceMiddleware:
+    """ASGI middleware giving each HTTP request a trace id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope.get("headers") or []).get(b"x-trace-id", b"").decode("latin-1")
+        trace_id = incoming if _VALID_TRACE_ID.match(incoming) else str(uuid.uuid4())
+        token = _trace_id.set(trace_id)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-trace-id", trace_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            _trace_id.reset(token)
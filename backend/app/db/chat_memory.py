@@ -1,7 +1,9 @@
 # backend/app/db/chat_memory.py
 from app.db.models import ChatSession, ChatMessage
+from sqlalchemy import select, delete, insert, update, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 
 MAX_MESSAGES = 100
 
@@ -52,18 +54,166 @@ def save_message(db: Session, session_id: int, role: str, content: str):
         db.delete(m)
     db.commit()
 
-def load_conversation(db: Session, session_id: int) -> list[dict]:
+def _exchange_statements(session_id: int, user_msg: str, assistant_msg: str):
     """
-    Load messages for a given session, in chronological order.
+    The three statements of one exchange write: touch the session, insert
+    both messages, prune everything older than the newest MAX_MESSAGES.
     """
-    # Optional safety: return empty if session does not exist
-    if not get_session(db, session_id):
-        return []
+    now = datetime.utcnow()
+    touch = (
+        update(ChatSession)
+        .where(ChatSession.id == session_id)
+        .values(updated_at=now)
+    )
+    add = insert(ChatMessage).values([
+        {"session_id": session_id, "role": "user", "content": user_msg, "created_at": now},
+        # 1µs later so created_at alone orders the pair
+        {"session_id": session_id, "role": "assistant", "content": assistant_msg,
+         "created_at": now + timedelta(microseconds=1)},
+    ])
+    # Timestamp of the oldest message to keep; a range DELETE on
+    # ix_chat_messages_session_created removes everything before it
+    cutoff = (
+        select(ChatMessage.created_at)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at.desc())
+        .offset(MAX_MESSAGES - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    prune = delete(ChatMessage).where(
+        ChatMessage.session_id == session_id,
+        ChatMessage.created_at < cutoff,
+    )
+    return touch, add, prune
 
-    msgs = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(ChatMessage.created_at.asc())
+def save_exchange(db: Session, session_id: int, user_msg: str, assistant_msg: str):
+    """
+    Save a user question and its answer in one transaction: bump the
+    session's updated_at, insert both messages, prune beyond MAX_MESSAGES.
+    """
+    touch, add, prune = _exchange_statements(session_id, user_msg, assistant_msg)
+    try:
+        if db.execute(touch).rowcount == 0:
+            raise ValueError(f"Session {session_id} does not exist.")
+        db.execute(add)
+        db.execute(prune)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def load_messages_page(
+    db: Session,
+    session_id: int,
+    before: int | None = None,
+    limit: int = 100,
+) -> tuple[list[ChatMessage], bool]:
+    """
+    One page of a session's messages, in chronological order, ending just
+    before message ``before`` (or at the newest message). Keyset
+    pagination on (created_at, id): pass the first message's id of a page
+    as ``before`` to get the previous one.
+
+    Returns the page and whether older messages exist.
+    """
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if before is not None:
+        cursor = db.query(ChatMessage.created_at).filter(
+            ChatMessage.id == before,
+            ChatMessage.session_id == session_id,
+        ).first()
+        if cursor is None:
+            return [], False
+        query = query.filter(or_(
+            ChatMessage.created_at < cursor.created_at,
+            and_(ChatMessage.created_at == cursor.created_at, ChatMessage.id < before),
+        ))
+    rows = (
+        query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)
         .all()
     )
-    return [{"role": m.role, "content": m.content} for m in msgs]
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+def load_unsummarized(db: Session, session_id: int) -> tuple[ChatSession | None, list[ChatMessage]]:
+    """
+    Return the session and its messages not yet folded into the summary,
+    in chronological order.
+    """
+    session = get_session(db, session_id)
+    if session is None:
+        return None, []
+    query = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+    if session.summary_message_id is not None:
+        query = query.filter(ChatMessage.id > session.summary_message_id)
+    return session, query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).all()
+
+def store_summary(
+    db: Session,
+    session_id: int,
+    summary: str,
+    through_id: int,
+    previous_through_id: int | None,
+) -> bool:
+    """
+    Save a new rolling summary covering messages up to ``through_id``.
+    Only applies if the summary has not moved since it was read; returns
+    whether it was stored.
+    """
+    if previous_through_id is None:
+        unchanged = ChatSession.summary_message_id.is_(None)
+    else:
+        unchanged = ChatSession.summary_message_id == previous_through_id
+    result = db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == session_id, unchanged)
+        .values(summary=summary, summary_message_id=through_id)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+# ---------- Async variants (used by the async /rag/ask path) ----------
+
+async def get_owned_session_async(db: AsyncSession, session_id: int, user_id: int) -> ChatSession | None:
+    """
+    Retrieve a chat session by ID if it belongs to ``user_id``.
+    """
+    result = await db.execute(
+        select(ChatSession).where(
+            ChatSession.id == session_id,
+            ChatSession.user_id == user_id,
+        )
+    )
+    return result.scalars().first()
+
+async def save_exchange_async(db: AsyncSession, session_id: int, user_msg: str, assistant_msg: str):
+    """
+    Save a user question and its answer in one transaction: bump the
+    session's updated_at, insert both messages, prune beyond MAX_MESSAGES.
+    """
+    touch, add, prune = _exchange_statements(session_id, user_msg, assistant_msg)
+    try:
+        if (await db.execute(touch)).rowcount == 0:
+            raise ValueError(f"Session {session_id} does not exist.")
+        await db.execute(add)
+        await db.execute(prune)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def load_history_async(db: AsyncSession, session: ChatSession, limit: int) -> list[dict]:
+    """
+    Load the newest ``limit`` messages not covered by the session summary,
+    in chronological order. Reads at most ``limit`` rows however long the
+    session is.
+    """
+    query = select(ChatMessage.role, ChatMessage.content).where(ChatMessage.session_id == session.id)
+    if session.summary_message_id is not None:
+        query = query.where(ChatMessage.id > session.summary_message_id)
+    result = await db.execute(
+        query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+    )
+    return [{"role": role, "content": content} for role, content in reversed(result.all())]
@@ -0,0 +1,25 @@
+# backend/app/db/migrate.py
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app.db.base import Base
+
+
+def add_missing_columns(engine: Engine):
+    """
+    Add nullable columns declared on the models but missing from existing
+    tables. create_all() only creates whole tables, so a database from an
+    older version would otherwise lack newly added columns.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+                print(f"Added column {table.name}.{column.name}")
@@ -46,6 +46,8 @@ class ChatSession(Base):
 
     # Rolling summary of this session
     summary = Column(Text, nullable=True)
+    # Last message folded into ``summary``; later messages are sent verbatim
+    summary_message_id = Column(Integer, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -84,3 +86,36 @@ Index(
     ChatMessage.session_id,
     ChatMessage.created_at,
 )
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | succeeded | failed
+    stage = Column(String(32), nullable=True)  # see ingest_docs' progress stages
+    progress_done = Column(Integer, nullable=True)
+    progress_total = Column(Integer, nullable=True)
+
+    files = Column(Text, nullable=True)  # JSON list of uploaded paths, relative to app/data
+    # "host:pid" of the server process whose ingest worker owns the job
+    worker = Column(String(128), nullable=True)
+    force = Column(Boolean, default=False)
+
+    # Filled in when the job finishes
+    index_version = Column(String(32), nullable=True)
+    chunks = Column(Integer, nullable=True)
+    embedded = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,10 +1,75 @@
 # db/session.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
 
-DATABASE_URL = "sqlite:///./app.db"
+# Async drivers for the sync URL's backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def async_url(url: str | URL) -> URL:
+    """The async-driver equivalent of a sync database URL."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def sqlite_pragmas(dbapi_connection, connection_record=None):
+    # WAL lets readers run alongside the single writer; NORMAL sync is
+    # durable across application crashes, only an OS crash can lose the
+    # last commits; busy_timeout makes writers queue instead of failing
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def _engine_kwargs(url: URL) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def create_db_engine(url: str | URL):
+    """Sync engine with pooling / SQLite pragmas for ``url``."""
+    url = make_url(url)
+    connect_args = {"check_same_thread": False} if url.get_backend_name() == "sqlite" else {}
+    db_engine = create_engine(url, connect_args=connect_args, **_engine_kwargs(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(db_engine, "connect", sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(url: str | URL):
+    """Async engine for the same database as the sync ``url``."""
+    url = async_url(url)
+    db_engine = create_async_engine(url, **_engine_kwargs(url))
+    if url.get_backend_name() == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", sqlite_pragmas)
+    return db_engine
+
+
+DATABASE_URL = settings.DATABASE_URL
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the request path that awaits DB I/O (/rag/ask*)
+async_engine = create_async_db_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
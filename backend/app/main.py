@@ -1,10 +1,23 @@
 # backend/app/main.py
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import faiss
 from fastapi import FastAPI, responses
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings
+from app.core.tracing import TraceMiddleware
 from app.api.auth import router as auth_router
-from app.db.session import engine
+from app.db.session import engine, async_engine
 from app.db.base import Base
+from app.db.migrate import add_missing_columns
 from app.rag.ingest import ingest_docs
+from app.rag.ingest_jobs import fail_interrupted_jobs
+from app.rag import index_store
+from app.rag.engine import EngineUnavailable, get_engine
+from app.rag.model import get_model, is_model_loaded, model_load_seconds
 from app.api.rag import router as rag_router
 
 app = FastAPI(title="Socrates RAG Backend")
@@ -13,10 +26,76 @@ app = FastAPI(title="Socrates RAG Backend")
 app.include_router(rag_router)
 app.include_router(auth_router)
 
-# Auto-ingest on startup
+# Readiness is tracked separately from liveness: the process answers
+# /health immediately while the model, index and engine warm up.
+readiness = {"ready": False, "stage": "starting", "error": None, "warmup_seconds": None}
+# Seconds clients are told to wait when a query arrives before the store exists
+RETRY_AFTER_SECONDS = 10
+# Set in the gunicorn master (see gunicorn.conf.py); forked workers inherit it
+_preloaded = False
+
+
+def warmup(ingest=ingest_docs):
+    start = time.perf_counter()
+    try:
+        readiness["stage"] = "loading_model"
+        get_model()
+        readiness["stage"] = "ingesting"
+        ingest()
+        readiness["stage"] = "loading_index"
+        get_engine()
+        readiness["stage"] = "ready"
+        readiness["ready"] = True
+    except Exception as e:
+        readiness["stage"] = "failed"
+        readiness["error"] = str(e)
+        print(f"❌ Warmup failed: {e}")
+    readiness["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+
+def _ingest_in_child():
+    """ingest_docs() in a spawned process, so the caller never runs the model."""
+    proc = multiprocessing.get_context("spawn").Process(target=ingest_docs, name="ingest")
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"Ingestion process exited with code {proc.exitcode}")
+
+
+def preload():
+    """
+    Warm up once in the gunicorn master, before workers are forked.
+
+    Workers then share the model weights and BM25 arrays copy-on-write and
+    the memory-mapped FAISS index and chunk store through the page cache,
+    instead of each loading its own copy. Ingestion (the only step that runs
+    the model) happens in a spawned child: torch's thread pools do not
+    survive fork().
+    """
+    global _preloaded
+    _preloaded = True
+    warmup(ingest=_ingest_in_child)
+
+
+def after_fork(n_workers: int):
+    """Per-worker setup after gunicorn forks (post_fork hook)."""
+    # Pooled connections opened by the master must not be shared
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    # One compute pool per worker; N workers x all cores would oversubscribe
+    threads = settings.WORKER_COMPUTE_THREADS or max(1, (os.cpu_count() or 1) // max(n_workers, 1))
+    faiss.omp_set_num_threads(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+# Auto-ingest on startup, off the serving path
 @app.on_event("startup")
 def startup_ingest():
-    ingest_docs()
+    fail_interrupted_jobs()
+    if _preloaded:
+        return  # warmed up in the gunicorn master
+    threading.Thread(target=warmup, name="warmup", daemon=True).start()
 
 # CORS - allow any origin (safe for API-only backend with separate frontend)
 app.add_middleware(
@@ -25,10 +104,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Has-More", "X-Trace-Id"],
 )
+app.add_middleware(TraceMiddleware)
 
 # Create database tables if they don't exist
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 # Simple root endpoint - this is the key fix for HF Spaces "Starting" issue
 @app.get("/", response_class=responses.HTMLResponse)
@@ -58,11 +140,35 @@ def root():
     </html>
     """
 
-# Health endpoint (already present, kept for clarity)
+# Liveness: the process is up and serving HTTP
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+# Readiness: model loaded and index available for /rag/ask
+@app.get("/ready")
+def ready():
+    body = {
+        **readiness,
+        "model_loaded": is_model_loaded(),
+        "model_load_seconds": model_load_seconds(),
+        "index_version": index_store.current_name(),
+    }
+    if not readiness["ready"]:
+        return responses.JSONResponse(status_code=503, content=body)
+    return body
+
+
+# Queries that arrive before the first store is published: retry later, not a 500
+@app.exception_handler(EngineUnavailable)
+def engine_unavailable(request, exc):
+    return responses.JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "stage": readiness["stage"]},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
 # Detailed startup logging - helps confirm everything loaded correctly
 @app.on_event("startup")
 async def startup_event():
@@ -70,7 +176,7 @@ async def startup_event():
     print("SOCRATES RAG BACKEND STARTED SUCCESSFULLY!")
     print("="*60)
     print("• Database tables ensured")
-    print("• PDF ingestion completed (or skipped if no new docs)")
+    print("• Model + PDF ingestion warming up in the background (see /ready)")
     print("• API endpoints mounted: /rag/* and /auth/*")
     print("• Swagger docs available at /docs")
     print("• Root page active at /")
@@ -0,0 +1,112 @@
+# backend/app/rag/answer_cache.py
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+import numpy as np
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Paraphrases that retrieve the same chunks land in one bucket; the cap
+# keeps a popular bucket from turning the lookup into a scan
+MAX_ENTRIES_PER_BUCKET = 8
+
+
+@dataclass
+class CachedAnswer:
+    query_vec: np.ndarray  # unit-length (dim,) float32
+    answer: str
+    llm_seconds: float
+
+
+def history_key(conversation: list[dict], summary: str | None = None) -> str:
+    """
+    Digest of the history (and rolling summary) that build_prompt() will
+    include. An empty history maps to "" and is shared by everyone; any
+    prior dialogue makes the key session-specific, so an answer is only
+    reused for an identical prompt.
+    """
+    if not conversation and not summary:
+        return ""
+    payload = json.dumps(
+        [summary or "", [(m["role"], m["content"]) for m in conversation[-20:]]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers.
+
+    Entries are bucketed by (retrieved chunk_ids, history digest) - the
+    exact inputs build_prompt() sees besides the question - and a hit
+    additionally needs the question embedding to be within ``threshold``
+    cosine similarity of a cached one. Buckets are LRU/TTL evicted.
+
+    ``invalidate()`` drops everything and bumps a generation counter so
+    answers computed against the previous index are not stored afterwards.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None, threshold: float):
+        self.threshold = threshold
+        self._buckets = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    @staticmethod
+    def _key(chunk_ids: list[str], history: str) -> tuple:
+        return tuple(chunk_ids), history
+
+    def get(self, query_vec: np.ndarray, chunk_ids: list[str], history: str) -> CachedAnswer | None:
+        bucket = self._buckets.get(self._key(chunk_ids, history))
+        best, best_sim = None, self.threshold
+        if bucket:
+            with self._lock:
+                entries = list(bucket)
+            for entry in entries:
+                sim = float(entry.query_vec @ query_vec)
+                if sim >= best_sim:
+                    best, best_sim = entry, sim
+
+        if best is None:
+            metrics.inc("answer_cache_misses")
+            return None
+        metrics.inc("answer_cache_hits")
+        metrics.inc("answer_cache_saved_llm_seconds_total", best.llm_seconds)
+        return best
+
+    def set(
+        self,
+        query_vec: np.ndarray,
+        chunk_ids: list[str],
+        history: str,
+        answer: str,
+        llm_seconds: float,
+        generation: int,
+    ):
+        """Store an answer; ``generation`` is the value read before the LLM call."""
+        entry = CachedAnswer(np.asarray(query_vec, dtype=np.float32).ravel(), answer, llm_seconds)
+        key = self._key(chunk_ids, history)
+        with self._lock:
+            if generation != self.generation:
+                return  # the index was rebuilt while this answer was generated
+            bucket = self._buckets.get(key) or []
+            bucket = (bucket + [entry])[-MAX_ENTRIES_PER_BUCKET:]
+            self._buckets.set(key, bucket)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+answer_cache = AnswerCache(
+    maxsize=settings.ANSWER_CACHE_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL_SECONDS or None,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
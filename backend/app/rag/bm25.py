@@ -0,0 +1,294 @@
+# backend/app/rag/bm25.py
+from array import array
+from collections import Counter
+from typing import Iterable
+import numpy as np
+
+
+# Scratch memory per batch of top_k_many: each dense score cell costs a
+# float64 bincount slot, its float32 copy, the negated copy and an int64
+# argpartition index; each expanded posting an int64 index + float64 weight
+BLOCK_MEMORY_BYTES = 32 << 20
+_CELL_BYTES = 24
+_POSTING_BYTES = 16
+
+
+def tokenize(text: str) -> list[str]:
+    """Whitespace tokenizer shared by indexing and querying."""
+    return text.split()
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a CSR-style inverted index.
+
+    Postings for term id ``t`` live in ``doc_ids[indptr[t]:indptr[t+1]]``
+    (with matching ``tfs``), so scoring a query only touches the postings
+    of its terms instead of every chunk. Scores match ``rank_bm25.BM25Okapi``
+    with the same k1/b/epsilon.
+    """
+
+    def __init__(
+        self,
+        terms: list[str],
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ):
+        self.vocab = {t: i for i, t in enumerate(terms)}
+        self.terms = terms
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.n_docs = len(doc_len)
+        avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        # Per-document length normalisation, precomputed once
+        self._norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+        df = np.diff(indptr).astype(np.float64)
+        idf = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            average_idf = idf.sum() / len(idf)
+            idf[idf < 0] = epsilon * average_idf
+        self.idf = idf.astype(np.float32)
+
+    def __len__(self):
+        return self.n_docs
+
+    # ---------- Building ----------
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **params) -> "BM25Index":
+        """Build the index in a single pass over chunk texts."""
+        builder = BM25Builder()
+        for text in texts:
+            builder.add(text)
+        return builder.finish(**params)
+
+    # ---------- Persistence ----------
+
+    def save(self, path: str):
+        """Write the index as a single .npz (terms stored as one UTF-8 blob)."""
+        encoded = [t.encode("utf-8") for t in self.terms]
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=term_offsets[1:])
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                term_blob=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                term_offsets=term_offsets,
+                indptr=self.indptr,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                doc_len=self.doc_len,
+                params=np.array([self.k1, self.b, self.epsilon], dtype=np.float64),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            blob = data["term_blob"].tobytes()
+            offsets = data["term_offsets"]
+            terms = [
+                blob[offsets[i]:offsets[i + 1]].decode("utf-8")
+                for i in range(len(offsets) - 1)
+            ]
+            k1, b, epsilon = data["params"].tolist()
+            return cls(
+                terms,
+                data["indptr"],
+                data["doc_ids"],
+                data["tfs"],
+                data["doc_len"],
+                k1=k1,
+                b=b,
+                epsilon=epsilon,
+            )
+
+    # ---------- Scoring ----------
+
+    def score_sparse(self, query_tokens: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score only the documents that contain at least one query term.
+        Returns (doc_ids, scores); cost is linear in the matched postings.
+        """
+        doc_parts = []
+        score_parts = []
+        for term in query_tokens:
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            docs, weights = self._term_weights(tid)
+            doc_parts.append(docs)
+            score_parts.append(weights)
+
+        if not doc_parts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if len(doc_parts) == 1:
+            return doc_parts[0], score_parts[0]
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        return docs, scores.astype(np.float32)
+
+    def get_scores(self, query_tokens: list[str]) -> np.ndarray:
+        """Dense score vector over all documents (BM25Okapi-compatible)."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        docs, doc_scores = self.score_sparse(query_tokens)
+        scores[docs] = doc_scores
+        return scores
+
+    def _term_weights(self, tid: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[tid], self.indptr[tid + 1]
+        docs = self.doc_ids[start:end]
+        tf = self.tfs[start:end].astype(np.float32)
+        return docs, self.idf[tid] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+
+    def score_matrix(self, queries: list[list[str]]) -> np.ndarray:
+        """
+        Dense (len(queries), n_docs) score matrix for a batch of queries.
+
+        Every (query, term) pair is expanded into its postings once and all
+        contributions are summed with a single bincount over the flattened
+        matrix, instead of a Python loop per query.
+        """
+        term_rows: dict[int, list[int]] = {}
+        for row, tokens in enumerate(queries):
+            for term in tokens:
+                tid = self.vocab.get(term)
+                if tid is not None:
+                    # repeated query terms count repeatedly, as in BM25Okapi
+                    term_rows.setdefault(tid, []).append(row)
+
+        flat_idx, flat_w = [], []
+        for tid, rows in term_rows.items():
+            docs, weights = self._term_weights(tid)
+            rows = np.asarray(rows, dtype=np.int64)
+            flat_idx.append((rows[:, None] * self.n_docs + docs[None, :]).ravel())
+            flat_w.append(np.broadcast_to(weights, (len(rows), len(weights))).ravel())
+
+        size = len(queries) * self.n_docs
+        if not flat_idx:
+            return np.zeros((len(queries), self.n_docs), dtype=np.float32)
+        scores = np.bincount(
+            np.concatenate(flat_idx),
+            weights=np.concatenate(flat_w),
+            minlength=size,
+        )
+        return scores.reshape(len(queries), self.n_docs).astype(np.float32)
+
+    def _blocks(self, queries: list[list[str]], memory_budget: int):
+        """
+        Split ``queries`` into consecutive blocks whose dense score rows and
+        expanded postings fit ``memory_budget`` bytes (at least one query each).
+        """
+        df = np.diff(self.indptr)
+        lo, used = 0, 0
+        for i, tokens in enumerate(queries):
+            postings = sum(int(df[self.vocab[t]]) for t in tokens if t in self.vocab)
+            cost = self.n_docs * _CELL_BYTES + postings * _POSTING_BYTES
+            if i > lo and used + cost > memory_budget:
+                yield queries[lo:i]
+                lo, used = i, 0
+            used += cost
+        if lo < len(queries):
+            yield queries[lo:]
+
+    def top_k_many(
+        self,
+        queries: list[list[str]],
+        k: int,
+        memory_budget: int = BLOCK_MEMORY_BYTES,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        ``top_k`` for many queries. Queries are scored a block at a time,
+        block size following from n_docs and the postings involved so that
+        scratch memory stays near ``memory_budget`` however large the corpus.
+        """
+        out = []
+        k = min(k, self.n_docs)
+        for queries_block in self._blocks(queries, memory_budget):
+            block = self.score_matrix(queries_block)
+            if k <= 0:
+                out.extend((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in block)
+                continue
+            part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            part_scores = np.take_along_axis(block, part, axis=1)
+            order = np.argsort(-part_scores, axis=1, kind="stable")
+            ids = np.take_along_axis(part, order, axis=1)
+            scores = np.take_along_axis(part_scores, order, axis=1)
+            for row_ids, row_scores in zip(ids, scores):
+                matched = row_scores > 0  # same contract as top_k: matches only
+                out.append((row_ids[matched], row_scores[matched]))
+        return out
+
+    def top_k(self, query_tokens: list[str], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Best ``k`` matching documents, highest score first."""
+        docs, scores = self.score_sparse(query_tokens)
+        if len(docs) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
+
+
+class BM25Builder:
+    """
+    Collect BM25 postings one chunk at a time.
+
+    Each posting is kept as a packed (term id, doc id, tf) int32 triple,
+    12 bytes instead of two Python ints in per-term lists. finish() sorts
+    them by term into the CSR layout; the stable sort keeps doc ids
+    ascending within a term.
+    """
+
+    FLUSH_POSTINGS = 1 << 16
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self._doc_len = array("i")
+        self._pending = array("i")
+        self._blocks: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, text: str):
+        tokens = tokenize(text)
+        doc_id = len(self._doc_len)
+        self._doc_len.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            tid = self.vocab.setdefault(term, len(self.vocab))
+            self._pending.extend((tid, doc_id, tf))
+        if len(self._pending) >= 3 * self.FLUSH_POSTINGS:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._blocks.append(np.frombuffer(self._pending, dtype=np.int32).reshape(-1, 3).copy())
+            self._pending = array("i")
+
+    def finish(self, **params) -> BM25Index:
+        self._flush()
+        triples = np.concatenate(self._blocks) if self._blocks else np.zeros((0, 3), dtype=np.int32)
+        self._blocks = []
+        order = np.argsort(triples[:, 0], kind="stable")
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(triples[:, 0], minlength=len(self.vocab)), out=indptr[1:])
+        return BM25Index(
+            list(self.vocab),
+            indptr,
+            np.ascontiguousarray(triples[order, 1]),
+            np.ascontiguousarray(triples[order, 2]),
+            np.array(self._doc_len, dtype=np.int32),
+            **params,
+        )
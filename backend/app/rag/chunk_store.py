@@ -0,0 +1,289 @@
+# backend/app/rag/chunk_store.py
+"""
+Columnar, memory-mapped chunk metadata.
+
+One file holds everything retrieval needs to describe a chunk:
+
+    MAGIC | u32 version | u64 header length | JSON header | sections
+
+The JSON header carries the interned document table (doc_id, title; one
+entry per document, not per chunk) and the byte offset of each section.
+Sections are 64-byte aligned raw arrays:
+
+    offsets   int64[n + 1]   text of chunk i is blob[offsets[i]:offsets[i+1]]
+    chunk_doc int32[n]       row in the document table
+    chunk_no  int32[n]       chunk_id is f"{doc_id}_chunk{chunk_no}"
+    doc_src   uint8[n_docs]  index into SOURCES
+    blob      uint8[...]     all chunk texts, UTF-8, back to back
+
+Opening maps the file read-only and parses only the small header, so load
+time does not grow with the corpus and every worker process shares the
+same page-cache copy. Chunks are read through ChunkView, which decodes a
+field only when it is asked for. ChunkStoreWriter produces the file one
+record at a time, so writing does not hold the texts either.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Iterable, Iterator
+import numpy as np
+
+MAGIC = b"SOCCHUNK"
+VERSION = 1
+SOURCES = ("json", "pdf")
+_PREAMBLE = struct.Struct("<8sIQ")
+_ALIGN = 64
+
+_SECTIONS = (
+    ("offsets", np.int64),
+    ("chunk_doc", np.int32),
+    ("chunk_no", np.int32),
+    ("doc_src", np.uint8),
+)
+FIELDS = ("doc_id", "title", "chunk_id", "text", "source")
+
+
+def _aligned(pos: int) -> int:
+    return -(-pos // _ALIGN) * _ALIGN
+
+
+def _chunk_no(record: dict) -> int:
+    prefix = f"{record['doc_id']}_chunk"
+    chunk_id = record["chunk_id"]
+    if not chunk_id.startswith(prefix) or not chunk_id[len(prefix):].isdigit():
+        raise ValueError(f"chunk_id {chunk_id!r} does not follow '<doc_id>_chunk<n>'")
+    return int(chunk_id[len(prefix):])
+
+
+class ChunkView(Mapping):
+    """
+    Read-only view of one chunk (plus any per-result fields such as
+    ``score``). Behaves like the metadata dict it replaces: ``view["text"]``,
+    ``view.get("score")``, ``dict(view)``.
+    """
+
+    __slots__ = ("_store", "row", "_extra")
+
+    def __init__(self, store: "ChunkStore", row: int, **extra):
+        self._store = store
+        self.row = row
+        self._extra = extra
+
+    def __getitem__(self, key: str):
+        if key in self._extra:
+            return self._extra[key]
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self._store, key)(self.row)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return len(FIELDS) + len(self._extra)
+
+    def __repr__(self) -> str:
+        return f"ChunkView({self._store.chunk_id(self.row)!r}, {self._extra})"
+
+
+class ChunkStore:
+    """
+    Chunk metadata in the layout described in the module docstring.
+
+    ``ChunkStore.open(path)`` maps a file written by ``ChunkStore.write``;
+    ``ChunkStore.from_records`` builds the same structure in memory.
+    """
+
+    def __init__(self, buf, header: dict, base: int):
+        self._buf = buf
+        self.doc_ids: list[str] = header["doc_ids"]
+        self.titles: list[str] = header["titles"]
+        sections = header["sections"]
+        n, n_docs = header["chunks"], len(self.doc_ids)
+        counts = {"offsets": n + 1, "chunk_doc": n, "chunk_no": n, "doc_src": n_docs}
+        arrays = {
+            name: np.frombuffer(buf, dtype=dtype, count=counts[name], offset=base + sections[name])
+            for name, dtype in _SECTIONS
+        }
+        self._offsets = arrays["offsets"]
+        self._chunk_doc = arrays["chunk_doc"]
+        self._chunk_no = arrays["chunk_no"]
+        self._doc_src = arrays["doc_src"]
+        self._blob = base + sections["blob"]
+        self._n = n
+
+    # ---------- Building ----------
+
+    @staticmethod
+    def _head(doc_rows: dict[tuple[str, str, str], int], chunk_doc, chunk_no, lengths) -> bytes:
+        """Preamble, header and sections: everything in front of the blob."""
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(lengths, dtype=np.int64), out=offsets[1:])
+        arrays = {
+            "offsets": offsets,
+            "chunk_doc": np.asarray(chunk_doc, dtype=np.int32),
+            "chunk_no": np.asarray(chunk_no, dtype=np.int32),
+            "doc_src": np.asarray([SOURCES.index(src) for _, _, src in doc_rows], dtype=np.uint8),
+        }
+
+        sections, pos = {}, 0
+        for name, _ in _SECTIONS:
+            sections[name] = pos
+            pos = _aligned(pos + arrays[name].nbytes)
+        sections["blob"] = pos
+
+        header = json.dumps({
+            "chunks": len(lengths),
+            "doc_ids": [doc_id for doc_id, _, _ in doc_rows],
+            "titles": [title for _, title, _ in doc_rows],
+            "sources": list(SOURCES),
+            "sections": sections,
+        }, ensure_ascii=False).encode("utf-8")
+        preamble = _PREAMBLE.pack(MAGIC, VERSION, len(header)) + header
+        pad = _aligned(len(preamble)) - len(preamble)
+
+        out = bytearray(preamble + b"\0" * pad)
+        base = len(out)
+        for name, _ in _SECTIONS:
+            out += b"\0" * (base + sections[name] - len(out))
+            out += arrays[name].tobytes()
+        out += b"\0" * (base + sections["blob"] - len(out))
+        return bytes(out)
+
+    @classmethod
+    def write(cls, path: str, records: Iterable[dict]):
+        """Write chunk metadata dicts (doc_id, title, chunk_id, text, source)."""
+        with ChunkStoreWriter(path) as writer:
+            writer.extend(records)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "ChunkStore":
+        doc_rows: dict[tuple[str, str, str], int] = {}
+        chunk_doc, chunk_no, texts = [], [], []
+        for record in records:
+            key = (record["doc_id"], record["title"], record["source"])
+            chunk_doc.append(doc_rows.setdefault(key, len(doc_rows)))
+            chunk_no.append(_chunk_no(record))
+            texts.append(record["text"].encode("utf-8"))
+        head = cls._head(doc_rows, chunk_doc, chunk_no, [len(t) for t in texts])
+        return cls._from_buffer(head + b"".join(texts))
+
+    # ---------- Loading ----------
+
+    @classmethod
+    def _from_buffer(cls, buf) -> "ChunkStore":
+        magic, version, header_len = _PREAMBLE.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a chunk store file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported chunk store version {version}")
+        start = _PREAMBLE.size
+        header = json.loads(bytes(buf[start:start + header_len]).decode("utf-8"))
+        return cls(buf, header, _aligned(start + header_len))
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkStore":
+        """Map ``path`` read-only; nothing but the header is read up front."""
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls._from_buffer(buf)
+
+    # ---------- Access ----------
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, row: int) -> ChunkView:
+        row = int(row)
+        if not 0 <= row < self._n:
+            raise IndexError(row)
+        return ChunkView(self, row)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, row) for row in range(self._n))
+
+    def view(self, row: int, **extra) -> ChunkView:
+        """Result view of ``row`` carrying extra fields (e.g. scores)."""
+        return ChunkView(self, int(row), **extra)
+
+    def text(self, row: int) -> str:
+        lo, hi = self._offsets[row:row + 2].tolist()
+        return self._buf[self._blob + lo:self._blob + hi].decode("utf-8")
+
+    def doc_id(self, row: int) -> str:
+        return self.doc_ids[self._chunk_doc[row]]
+
+    def title(self, row: int) -> str:
+        return self.titles[self._chunk_doc[row]]
+
+    def source(self, row: int) -> str:
+        return SOURCES[self._doc_src[self._chunk_doc[row]]]
+
+    def chunk_id(self, row: int) -> str:
+        return f"{self.doc_id(row)}_chunk{self._chunk_no[row]}"
+
+    def texts(self) -> Iterator[str]:
+        """Every chunk text in row order (e.g. to build BM25)."""
+        return (self.text(row) for row in range(self._n))
+
+    def records(self, start: int = 0, end: int | None = None) -> list[dict]:
+        """Rows ``start:end`` as plain metadata dicts, as ingestion writes them."""
+        end = self._n if end is None else end
+        return [{field: getattr(self, field)(row) for field in FIELDS} for row in range(start, end)]
+
+
+class ChunkStoreWriter:
+    """
+    Write a chunk store file record by record without holding the texts.
+
+    Texts are appended to a side file as they arrive; only the document
+    table and three small integers per chunk stay in memory. close()
+    writes the header and sections and copies the texts in behind them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._blob_path = f"{path}.blob"
+        self._blob = open(self._blob_path, "wb")
+        self._doc_rows: dict[tuple[str, str, str], int] = {}
+        self._chunk_doc = array("i")
+        self._chunk_no = array("i")
+        self._lengths = array("q")
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, record: dict):
+        key = (record["doc_id"], record["title"], record["source"])
+        self._chunk_doc.append(self._doc_rows.setdefault(key, len(self._doc_rows)))
+        self._chunk_no.append(_chunk_no(record))
+        text = record["text"].encode("utf-8")
+        self._blob.write(text)
+        self._lengths.append(len(text))
+
+    def extend(self, records: Iterable[dict]):
+        for record in records:
+            self.add(record)
+
+    def close(self):
+        self._blob.close()
+        head = ChunkStore._head(self._doc_rows, self._chunk_doc, self._chunk_no, self._lengths)
+        with open(self.path, "wb") as out, open(self._blob_path, "rb") as blob:
+            out.write(head)
+            shutil.copyfileobj(blob, out, 1 << 20)
+        os.remove(self._blob_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._blob.close()
+            os.remove(self._blob_path)
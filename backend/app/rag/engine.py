@@ -0,0 +1,227 @@
+# backend/app/rag/engine.py
+import logging
+import os
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tracing import log_event, stage
+from app.rag import index_store
+from app.rag.answer_cache import answer_cache
+from app.rag.bm25 import BM25Index, tokenize
+from app.rag.chunk_store import ChunkStore, ChunkView
+from app.rag.fusion import fuse
+from app.rag.index_store import StoreVersion
+from app.rag.index_factory import configure_search, search_params
+from app.rag.query_cache import encode_query, encode_queries
+from app.rag.retrieve import load_index, build_bm25_index
+
+
+class EngineUnavailable(RuntimeError):
+    """No store has been published yet (first boot, ingestion still running)."""
+
+
+class RetrievalEngine:
+    """
+    Process-resident retrieval state.
+
+    Holds the FAISS index, the (memory-mapped) chunk store and the BM25
+    inverted index so that a query only pays for encoding and searching,
+    not for re-reading the vector store from disk.
+    """
+
+    def __init__(
+        self,
+        index,
+        chunks: ChunkStore,
+        bm25: BM25Index | None = None,
+        embeddings: np.ndarray | None = None,
+        version: str | None = None,
+    ):
+        self.index = index
+        configure_search(index)
+        self.chunks = chunks
+        self.bm25 = bm25 if bm25 is not None else build_bm25_index(chunks)
+        # L2-normalized chunk vectors (memory-mapped); gives exact cosine
+        # similarity for keyword-only hits and for compressed (PQ) indexes
+        self.embeddings = embeddings
+        # Store version the files came from (None: legacy layout / in memory)
+        self.version = version
+
+    @classmethod
+    def load(cls, version: StoreVersion | None = None) -> "RetrievalEngine":
+        """Load every file from one store version (default: the live one)."""
+        version = version or index_store.current()
+        if version is None:
+            raise EngineUnavailable("Vector DB does not exist yet; ingestion has not finished")
+        index, chunks = load_index(version)
+        bm25 = None
+        if os.path.exists(version.bm25):
+            bm25 = BM25Index.load(version.bm25)
+            if len(bm25) != len(chunks):
+                # Stale file from an older ingest; rebuild in memory instead
+                bm25 = None
+        embeddings = None
+        if os.path.exists(version.embeddings):
+            embeddings = np.load(version.embeddings, mmap_mode="r")
+            if len(embeddings) != len(chunks):
+                embeddings = None
+        return cls(index, chunks, bm25, embeddings, version.name)
+
+    def _similarities(self, query_vec: np.ndarray, ids: list[int], dense: dict[int, float]) -> list[float]:
+        """Cosine similarity of each chunk to the query."""
+        if self.embeddings is not None and ids:
+            order = np.argsort(ids)
+            rows = np.asarray(self.embeddings[np.asarray(ids)[order]], dtype=np.float32)
+            sims = np.empty(len(ids), dtype=np.float32)
+            sims[order] = rows @ query_vec
+            return sims.tolist()
+        return [dense.get(i, 0.0) for i in ids]
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        ef_search: int | None = None,
+        nprobe: int | None = None,
+        fusion: str | None = None,
+    ) -> list[ChunkView]:
+        """
+        Hybrid retrieval: FAISS embeddings + BM25 keyword search.
+
+        Both retrievers return ``RETRIEVAL_CANDIDATES`` candidates which are
+        fused (RRF or weighted sum, see app.rag.fusion) and cut to top_k.
+        Each result is a read-only ChunkView carrying ``score`` = cosine
+        similarity to the query and ``fused_score`` = the rank-fusion score
+        used for ordering.
+        ``ef_search`` / ``nprobe`` override the HNSW / IVF search defaults.
+        """
+        n_candidates = max(top_k, settings.RETRIEVAL_CANDIDATES)
+
+        # --- Embedding search (inner product on unit vectors = cosine) ---
+        with stage("encode"):
+            vec = encode_query(query)
+        params = search_params(self.index, ef_search, nprobe)
+        with stage("faiss"):
+            D, I = self.index.search(vec, n_candidates, params=params)
+        found = I[0] >= 0  # ANN indexes may return fewer hits
+        dense_ids, dense_scores = I[0][found], D[0][found]
+
+        # --- BM25 keyword search ---
+        with stage("bm25"):
+            sparse = self.bm25.top_k(tokenize(query), n_candidates)
+
+        with stage("fusion"):
+            return self._fuse_results(vec[0], dense_ids, dense_scores, sparse, top_k, fusion)
+
+    def retrieve_many(
+        self,
+        queries: list[str],
+        top_k: int = 5,
+        ef_search: int | None = None,
+        nprobe: int | None = None,
+        fusion: str | None = None,
+    ) -> list[list[ChunkView]]:
+        """
+        ``retrieve`` for a batch of queries: one batched encode for cache
+        misses, one FAISS search over the query matrix and one vectorized
+        BM25 scoring pass, then per-query fusion.
+        """
+        if not queries:
+            return []
+        n_candidates = max(top_k, settings.RETRIEVAL_CANDIDATES)
+
+        # Same stages as retrieve(); each sample covers the whole batch
+        batch = {"queries": len(queries)}
+        with stage("encode", **batch):
+            vecs = encode_queries(queries)
+        params = search_params(self.index, ef_search, nprobe)
+        with stage("faiss", **batch):
+            D, I = self.index.search(vecs, n_candidates, params=params)
+        with stage("bm25", **batch):
+            sparse = self.bm25.top_k_many([tokenize(q) for q in queries], n_candidates)
+
+        results = []
+        with stage("fusion", **batch):
+            for row in range(len(queries)):
+                found = I[row] >= 0
+                results.append(self._fuse_results(
+                    vecs[row], I[row][found], D[row][found], sparse[row], top_k, fusion
+                ))
+        return results
+
+    def _fuse_results(self, query_vec, dense_ids, dense_scores, sparse, top_k, fusion) -> list[ChunkView]:
+        ranked = fuse(
+            (dense_ids, dense_scores),
+            sparse,
+            method=fusion or settings.FUSION_METHOD,
+            alpha=settings.FUSION_ALPHA,
+            rrf_k=settings.RRF_K,
+        )[:top_k]
+
+        ids = [i for i, _ in ranked]
+        dense = dict(zip(dense_ids.tolist(), dense_scores.tolist()))
+        similarities = self._similarities(query_vec, ids, dense)
+
+        return [
+            self.chunks.view(i, score=round(float(sim), 4), fused_score=round(float(fused), 6))
+            for (i, fused), sim in zip(ranked, similarities)
+        ]
+
+
+_engine: RetrievalEngine | None = None
+_engine_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_checked_at = 0.0
+
+
+def get_engine() -> RetrievalEngine:
+    """
+    Return the live engine, loading it on first use.
+
+    Every INDEX_CHECK_SECONDS the store's CURRENT pointer is read; when
+    another process (or a background ingest job) has published a newer
+    version, it is loaded in the background and swapped in, and this call
+    keeps returning the old engine until then.
+    """
+    global _engine, _checked_at
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RetrievalEngine.load()
+                _checked_at = time.monotonic()
+    elif settings.INDEX_CHECK_SECONDS > 0 and time.monotonic() - _checked_at >= settings.INDEX_CHECK_SECONDS:
+        _checked_at = time.monotonic()
+        latest = index_store.current_name()
+        if latest is not None and latest != _engine.version and _refresh_lock.acquire(blocking=False):
+            threading.Thread(target=_refresh, name="engine-refresh", daemon=True).start()
+    return _engine
+
+
+def _refresh():
+    try:
+        if index_store.current_name() != _engine.version:
+            reload_engine()
+    except Exception as e:
+        log_event("engine_reload_error", level=logging.WARNING, error=str(e))
+    finally:
+        _refresh_lock.release()
+
+
+def reload_engine() -> RetrievalEngine:
+    """
+    Build a fresh engine from the live store version and swap it in.
+
+    The new engine is fully constructed before the module reference is
+    replaced, so in-flight queries keep using the old one until they finish.
+    Cached answers refer to the old chunks and are dropped.
+    """
+    global _engine
+    engine = RetrievalEngine.load()
+    with _engine_lock:
+        _engine = engine
+    answer_cache.invalidate()
+    metrics.inc("index_reloads")
+    log_event("engine_reloaded", version=engine.version, chunks=len(engine.chunks))
+    return engine
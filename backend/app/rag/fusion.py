@@ -0,0 +1,75 @@
+# backend/app/rag/fusion.py
+"""
+Score fusion for hybrid retrieval.
+
+Dense (cosine) and sparse (BM25) scores live on different scales, so they
+are combined either by rank (RRF) or after min-max normalization.
+Inputs are parallel (ids, scores) sequences sorted best-first.
+"""
+from typing import Sequence
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    weights: Sequence[float] | None = None,
+    k: int = 60,
+) -> dict[int, float]:
+    """score(d) = sum_i w_i / (k + rank_i(d)), ranks starting at 1."""
+    weights = weights or [1.0] * len(rankings)
+    fused: dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            fused[doc] = fused.get(doc, 0.0) + weight / (k + rank)
+    return fused
+
+
+def min_max(scores: Sequence[float]) -> list[float]:
+    """Scale to [0, 1]; a constant list maps to all ones."""
+    if not len(scores):
+        return []
+    lo, hi = min(scores), max(scores)
+    if hi - lo < 1e-12:
+        return [1.0] * len(scores)
+    return [(s - lo) / (hi - lo) for s in scores]
+
+
+def weighted_sum(
+    results: Sequence[tuple[Sequence[int], Sequence[float]]],
+    weights: Sequence[float],
+) -> dict[int, float]:
+    """Sum of min-max normalized scores; a missing doc contributes 0."""
+    fused: dict[int, float] = {}
+    for (ids, scores), weight in zip(results, weights):
+        for doc, score in zip(ids, min_max(list(scores))):
+            fused[doc] = fused.get(doc, 0.0) + weight * score
+    return fused
+
+
+def fuse(
+    dense: tuple[Sequence[int], Sequence[float]],
+    sparse: tuple[Sequence[int], Sequence[float]],
+    method: str = "rrf",
+    alpha: float = 0.5,
+    rrf_k: int = 60,
+) -> list[tuple[int, float]]:
+    """
+    Combine dense and sparse results; ``alpha`` is the dense weight.
+    Returns (doc id, fused score) pairs, best first.
+    """
+    weights = [alpha, 1.0 - alpha]
+    if method == "rrf":
+        fused = reciprocal_rank_fusion(
+            [[int(i) for i in dense[0]], [int(i) for i in sparse[0]]],
+            weights=[2 * w for w in weights],  # alpha=0.5 -> plain RRF
+            k=rrf_k,
+        )
+    elif method == "weighted":
+        fused = weighted_sum(
+            [([int(i) for i in dense[0]], dense[1]), ([int(i) for i in sparse[0]], sparse[1])],
+            weights,
+        )
+    else:
+        raise ValueError(f"Unknown fusion method {method!r}; expected one of {FUSION_METHODS}")
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
@@ -0,0 +1,114 @@
+# backend/app/rag/index_factory.py
+import math
+import faiss
+import numpy as np
+from app.core.config import settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+
+# FAISS wants ~39 training points per centroid; below that it warns and
+# clustering quality drops, so nlist is clamped to what the corpus supports.
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS = 100_000
+# Smallest PQ code size tried before falling back to IVF-Flat
+MIN_PQ_NBITS = 4
+
+
+def index_spec() -> dict:
+    """Index-affecting settings; a change here forces an index rebuild."""
+    kind = settings.INDEX_TYPE.lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"INDEX_TYPE must be one of {INDEX_TYPES}, got {settings.INDEX_TYPE!r}")
+    spec = {"type": kind}
+    if kind == "hnsw":
+        spec.update(m=settings.HNSW_M, ef_construction=settings.HNSW_EF_CONSTRUCTION)
+    if kind in ("ivf", "ivfpq"):
+        spec.update(nlist=settings.IVF_NLIST)
+    if kind == "ivfpq":
+        spec.update(pq_m=settings.PQ_M, pq_nbits=settings.PQ_NBITS)
+    return spec
+
+
+def requires_training(spec: dict) -> bool:
+    return spec["type"] in ("ivf", "ivfpq")
+
+
+def _nlist_for(n_rows: int, requested: int) -> int:
+    nlist = requested or int(4 * math.sqrt(max(n_rows, 1)))
+    return max(1, min(nlist, n_rows // MIN_POINTS_PER_CENTROID or 1))
+
+
+def _pq_nbits_for(n_rows: int, requested: int) -> int | None:
+    """
+    Largest code size up to ``requested`` bits whose 2**nbits centroids
+    per sub-quantizer get MIN_POINTS_PER_CENTROID training rows each;
+    None when even MIN_PQ_NBITS cannot be trained.
+    """
+    for nbits in range(requested, MIN_PQ_NBITS - 1, -1):
+        if n_rows >= MIN_POINTS_PER_CENTROID * 2 ** nbits:
+            return nbits
+    return None
+
+
+def new_index(dim: int, spec: dict, n_rows: int = 0, metric=faiss.METRIC_INNER_PRODUCT) -> faiss.Index:
+    """
+    Create an empty index for ``spec``. ``n_rows`` sizes IVF lists and is
+    only needed for the trained index types.
+    """
+    kind = spec["type"]
+    if kind == "flat":
+        return faiss.index_factory(dim, "Flat", metric)
+
+    if kind == "hnsw":
+        index = faiss.index_factory(dim, f"HNSW{spec['m']},Flat", metric)
+        index.hnsw.efConstruction = spec["ef_construction"]
+        return index
+
+    nlist = _nlist_for(n_rows, spec["nlist"])
+    if kind == "ivfpq":
+        pq_m = spec["pq_m"]
+        nbits = _pq_nbits_for(n_rows, spec["pq_nbits"])
+        if dim % pq_m == 0 and nbits is not None:
+            if nbits != spec["pq_nbits"]:
+                print(f"⚠️ {n_rows} rows cannot train 2**{spec['pq_nbits']} PQ centroids; using {nbits} bits")
+            return faiss.index_factory(dim, f"IVF{nlist},PQ{pq_m}x{nbits}", metric)
+        print(f"⚠️ IVF-PQ not usable (dim={dim}, m={pq_m}, rows={n_rows}); using IVF-Flat")
+    return faiss.index_factory(dim, f"IVF{nlist},Flat", metric)
+
+
+def index_from_embeddings(embeddings: np.ndarray, spec: dict, batch_size: int, metric=faiss.METRIC_INNER_PRODUCT) -> faiss.Index:
+    """
+    Build an index from a (possibly memory-mapped) embedding matrix,
+    training on a sample first when the index type needs it and adding
+    rows in batches so the matrix is never fully materialized.
+    """
+    n_rows, dim = embeddings.shape
+    index = new_index(dim, spec, n_rows, metric)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        n_train = min(n_rows, MAX_TRAINING_POINTS)
+        sample = np.sort(rng.choice(n_rows, size=n_train, replace=False))
+        index.train(np.ascontiguousarray(embeddings[sample], dtype=np.float32))
+
+    for lo in range(0, n_rows, batch_size):
+        index.add(np.ascontiguousarray(embeddings[lo:lo + batch_size], dtype=np.float32))
+    return index
+
+
+def configure_search(index: faiss.Index):
+    """Apply the default search-time knobs from settings to a loaded index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.HNSW_EF_SEARCH
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = settings.IVF_NPROBE
+
+
+def search_params(index: faiss.Index, ef_search: int | None = None, nprobe: int | None = None):
+    """Per-request search parameters, or None to use the index defaults."""
+    if ef_search and isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    if nprobe and faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    return None
@@ -0,0 +1,224 @@
+# backend/app/rag/index_store.py
+"""
+Versioned vector store directory.
+
+    app/data/index/
+        CURRENT     name of the live version, e.g. "v000004"
+        LOCK        held while an ingest builds and publishes a version
+        v000003/    previous version, kept for processes still reading it
+        v000004/
+            vector_store.index
+            vector_store_chunks.bin
+            vector_store_bm25.npz
+            vector_store_embeddings.npy
+            vector_store_manifest.json
+
+Ingestion builds a complete version in a staging directory, renames it to
+its final name, then points CURRENT at it (temp file + rename). A reader
+resolves CURRENT once and opens every file from that one directory, so it
+sees the old store or the new one, never a mix and never a half-written
+index. Versions beyond INDEX_KEEP_VERSIONS are deleted; a process that
+still has their files mapped keeps reading them until it reloads.
+
+Stores written before versioning (the same files directly in app/data)
+are served as they are and replaced by the first versioned ingest.
+"""
+import fcntl
+import os
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from app.core.config import settings, INDEX_DIR
+
+INDEX_FILE = "vector_store.index"
+CHUNKS_FILE = "vector_store_chunks.bin"
+BM25_FILE = "vector_store_bm25.npz"
+EMBEDDINGS_FILE = "vector_store_embeddings.npy"
+MANIFEST_FILE = "vector_store_manifest.json"
+# Pickled list of metadata dicts written by older versions, before CHUNKS_FILE
+LEGACY_META_FILE = "vector_store_meta.pkl"
+
+CURRENT_FILE = os.path.join(INDEX_DIR, "CURRENT")
+LEGACY_DIR = os.path.dirname(INDEX_DIR)
+_VERSION_RE = re.compile(r"v\d{6}")
+_STAGING_PREFIX = ".staging-"
+
+
+@dataclass(frozen=True)
+class StoreVersion:
+    """One directory holding a complete set of store files."""
+    path: str
+
+    @property
+    def name(self) -> str | None:
+        """Version name, or None for the unversioned legacy layout."""
+        name = os.path.basename(self.path)
+        return name if _VERSION_RE.fullmatch(name) else None
+
+    @property
+    def index(self) -> str:
+        return os.path.join(self.path, INDEX_FILE)
+
+    @property
+    def chunks(self) -> str:
+        return os.path.join(self.path, CHUNKS_FILE)
+
+    @property
+    def legacy_meta(self) -> str:
+        return os.path.join(self.path, LEGACY_META_FILE)
+
+    @property
+    def bm25(self) -> str:
+        return os.path.join(self.path, BM25_FILE)
+
+    @property
+    def embeddings(self) -> str:
+        return os.path.join(self.path, EMBEDDINGS_FILE)
+
+    @property
+    def manifest(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def is_complete(self) -> bool:
+        """Index and chunk metadata are present (BM25/embeddings are optional)."""
+        has_chunks = os.path.exists(self.chunks) or os.path.exists(self.legacy_meta)
+        return os.path.exists(self.index) and has_chunks
+
+
+def current_name() -> str | None:
+    """Name of the live version; cheap enough to poll."""
+    try:
+        with open(CURRENT_FILE, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name if _VERSION_RE.fullmatch(name) else None
+
+
+def current() -> StoreVersion | None:
+    """The live store, or None if nothing has been ingested yet."""
+    name = current_name()
+    if name is not None:
+        version = StoreVersion(os.path.join(INDEX_DIR, name))
+        if version.is_complete():
+            return version
+    legacy = StoreVersion(LEGACY_DIR)
+    return legacy if legacy.is_complete() else None
+
+
+def _versions() -> list[str]:
+    if not os.path.isdir(INDEX_DIR):
+        return []
+    return sorted(n for n in os.listdir(INDEX_DIR) if _VERSION_RE.fullmatch(n))
+
+
+# ---------- Writing (only under ingest_lock) ----------
+
+_thread_lock = threading.RLock()
+_lock_depth = 0
+_lock_file = None
+
+
+@contextmanager
+def ingest_lock():
+    """
+    Exclusive right to build and publish versions, across threads and
+    server processes (flock on INDEX_DIR/LOCK). Re-entrant within a thread.
+    """
+    global _lock_depth, _lock_file
+    with _thread_lock:
+        if _lock_depth == 0:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            _lock_file = open(os.path.join(INDEX_DIR, "LOCK"), "a")
+            fcntl.flock(_lock_file, fcntl.LOCK_EX)
+        _lock_depth += 1
+        try:
+            yield
+        finally:
+            _lock_depth -= 1
+            if _lock_depth == 0:
+                _lock_file.close()  # releases the flock
+                _lock_file = None
+
+
+def stage() -> StoreVersion:
+    """
+    Fresh, empty staging directory for the next version. Leftovers of
+    an ingest that crashed before publishing are removed first.
+    """
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    for name in os.listdir(INDEX_DIR):
+        if name.startswith(_STAGING_PREFIX):
+            shutil.rmtree(os.path.join(INDEX_DIR, name), ignore_errors=True)
+    path = os.path.join(INDEX_DIR, f"{_STAGING_PREFIX}{uuid.uuid4().hex[:12]}")
+    os.mkdir(path)
+    return StoreVersion(path)
+
+
+def discard(staged: StoreVersion):
+    shutil.rmtree(staged.path, ignore_errors=True)
+
+
+def carry_over(previous: StoreVersion, staged: StoreVersion, *names: str):
+    """Reuse unchanged files of ``previous``: hard links, copies if unsupported."""
+    for name in names:
+        src = os.path.join(previous.path, name)
+        if not os.path.exists(src):
+            continue
+        dst = os.path.join(staged.path, name)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish(staged: StoreVersion) -> StoreVersion:
+    """
+    Turn a staged directory into the next version and make it live.
+
+    Files are flushed before the rename and CURRENT is replaced last, so a
+    crash at any point leaves CURRENT on a complete version.
+    """
+    if not staged.is_complete():
+        raise RuntimeError("Staged store is incomplete; refusing to publish it")
+    for name in os.listdir(staged.path):
+        _fsync(os.path.join(staged.path, name))
+
+    versions = _versions()
+    number = int(versions[-1][1:]) + 1 if versions else 1
+    version = StoreVersion(os.path.join(INDEX_DIR, f"v{number:06d}"))
+    os.rename(staged.path, version.path)
+
+    tmp = f"{CURRENT_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version.name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CURRENT_FILE)
+    _fsync(INDEX_DIR)
+
+    prune(version.name)
+    return version
+
+
+def prune(live: str, keep: int | None = None):
+    """Delete old versions (keeping ``keep`` including ``live``) and legacy files."""
+    keep = max(settings.INDEX_KEEP_VERSIONS if keep is None else keep, 1)
+    older = [n for n in _versions() if n != live]
+    for name in older[:max(len(older) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(INDEX_DIR, name), ignore_errors=True)
+    for name in (INDEX_FILE, CHUNKS_FILE, LEGACY_META_FILE, BM25_FILE, EMBEDDINGS_FILE, MANIFEST_FILE):
+        path = os.path.join(LEGACY_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
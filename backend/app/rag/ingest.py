@@ -1,22 +1,32 @@
 import os
 import json
-import pickle
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
 import faiss
 import numpy as np
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
-from app.core.config import (
-    DOCS_PATH,
-    VECTOR_DB_PATH,
-    VECTOR_DB_META_PATH,
-)
+from app.core.config import settings, DOCS_PATH
+from app.rag import index_store
+from app.rag.bm25 import BM25Builder
+from app.rag.chunk_store import ChunkStoreWriter
+from app.rag.index_store import StoreVersion
+from app.rag.index_factory import index_spec, requires_training, new_index, index_from_embeddings
+from app.rag.model import get_model
+from app.rag.manifest import load_manifest, save_manifest, diff_sources
+from app.rag.npy_writer import NpyAppender
+from app.rag.pdf_extract import count_pages, extract_pages
+from app.rag.retrieve import load_chunks
 from pathlib import Path
 
 
 APP_DIR = Path(__file__).resolve().parent.parent
-BOOKS_PATH = APP_DIR / "data" / "books"
-# Initialize model once
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+DATA_DIR = APP_DIR / "data"
+BOOKS_PATH = DATA_DIR / "books"
+# Pages handed to one extraction task; small enough to balance long books
+PAGES_PER_TASK = 32
 
 
 def chunk_text(text, chunk_size=200, overlap=50):
@@ -35,16 +45,36 @@ def chunk_text(text, chunk_size=200, overlap=50):
     return chunks
 
 
-def ingest_json_docs(all_chunks, metadata):
-    """Ingest existing JSON docs (unchanged behavior)."""
-    for fname in os.listdir(DOCS_PATH):
-        if not fname.endswith(".json"):
-            continue
+def scan_sources() -> dict[str, tuple[str, str]]:
+    """
+    List every ingestable file, keyed by its path relative to app/data.
+    Sorted keys give chunk rows a stable order across runs.
+    """
+    sources = {}
+    if os.path.exists(DOCS_PATH):
+        for fname in os.listdir(DOCS_PATH):
+            if fname.endswith(".json"):
+                path = os.path.join(DOCS_PATH, fname)
+                sources[os.path.relpath(path, DATA_DIR)] = (path, "json")
+
+    if os.path.exists(BOOKS_PATH):
+        for fname in os.listdir(BOOKS_PATH):
+            if fname.lower().endswith(".pdf"):
+                path = os.path.join(BOOKS_PATH, fname)
+                sources[os.path.relpath(path, DATA_DIR)] = (path, "pdf")
+    else:
+        print("No books directory found. Skipping PDF ingestion.")
+
+    return dict(sorted(sources.items()))
 
-        path = os.path.join(DOCS_PATH, fname)
+
+def ingest_json_docs(paths: list[str]):
+    """Chunk the given JSON doc files. Yields (path, chunks, metadata)."""
+    for path in paths:
         with open(path, "r", encoding="utf-8") as f:
             docs = json.load(f)
 
+        all_chunks, metadata = [], []
         for doc in docs:
             chunks = chunk_text(doc["body"])
             for i, chunk in enumerate(chunks):
@@ -56,85 +86,326 @@ def ingest_json_docs(all_chunks, metadata):
                     "text": chunk,
                     "source": "json"
                 })
+        yield path, all_chunks, metadata
 
 
-def ingest_pdf_books(all_chunks, metadata):
-    if not os.path.exists(BOOKS_PATH):
-        print("No books directory found. Skipping PDF ingestion.")
+def _pdf_chunks(path: str, pages: list[str]) -> tuple[list[str], list[dict]]:
+    fname = os.path.basename(path)
+    full_text = "\n".join(pages)
+    if not full_text.strip():
+        print(f"⚠️ No extractable text in {fname}")
+        return [], []
+
+    chunks = chunk_text(full_text)
+    book_id = os.path.splitext(fname)[0]
+
+    metadata = []
+    for i, chunk in enumerate(chunks):
+        metadata.append({
+            "doc_id": book_id,
+            "title": book_id.replace("_", " ").title(),
+            "chunk_id": f"{book_id}_chunk{i}",
+            "text": chunk,
+            "source": "pdf"
+        })
+    return chunks, metadata
+
+
+def _run_extraction(tasks: list[tuple[str, int, int]], workers: int):
+    """
+    Yield ((path, start, end), texts, seconds) as extraction tasks finish;
+    texts is None for a task that failed.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield task, *extract_pages(*task)
         return
 
-    for fname in os.listdir(BOOKS_PATH):
-        if not fname.lower().endswith(".pdf"):
-            continue
+    # Spawn, not fork: the caller is a threaded server process (torch,
+    # executor pools), and forking it can deadlock on locks held elsewhere
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(extract_pages, *task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                texts, seconds = future.result()
+            except Exception as e:
+                print(f"⚠️ Skipping pages {task[1]}-{task[2]} in {os.path.basename(task[0])}: {e}")
+                texts, seconds = None, 0.0
+            yield task, texts, seconds
 
-        path = os.path.join(BOOKS_PATH, fname)
-        print(f"Ingesting PDF: {fname}")
 
+def ingest_pdf_books(paths: list[str], workers: int | None = None, failed: set[str] | None = None):
+    """
+    Extract and chunk the given PDF books across a process pool.
+
+    Books are split into page ranges so long books spread over several
+    workers. Yields (path, chunks, metadata) for each book as soon as all of
+    its pages are in, so embedding overlaps with extraction of the rest.
+    Books that could not be opened, or had pages fail to extract, are
+    still yielded (with what was read) and their paths added to ``failed``.
+    Prints a per-book timing report and overall pages/s at the end.
+    """
+    failed = set() if failed is None else failed
+    workers = workers or settings.INGEST_WORKERS or os.cpu_count() or 1
+    began = time.perf_counter()
+
+    tasks = []
+    pending = {}
+    for path in paths:
+        fname = os.path.basename(path)
+        print(f"Ingesting PDF: {fname}")
         try:
-            reader = PdfReader(path)
+            n_pages = count_pages(path)
         except Exception as e:
             print(f"❌ Failed to open PDF {fname}: {e}")
+            failed.add(path)
+            yield path, [], []
+            continue
+        if n_pages == 0:
+            print(f"⚠️ No extractable text in {fname}")
+            yield path, [], []
             continue
+        for start in range(0, n_pages, PAGES_PER_TASK):
+            tasks.append((path, start, min(start + PAGES_PER_TASK, n_pages)))
+        pending[path] = {"pages": [None] * n_pages, "tasks": 0, "cpu": 0.0}
+    for path, _, _ in tasks:
+        pending[path]["tasks"] += 1
 
-        full_text = ""
+    workers = max(1, min(workers, len(tasks)))
+    report = []
+    for (path, start, end), texts, seconds in _run_extraction(tasks, workers):
+        book = pending[path]
+        if texts is None:
+            failed.add(path)
+            texts = [""] * (end - start)
+        book["pages"][start:end] = texts
+        book["cpu"] += seconds
+        book["tasks"] -= 1
+        if book["tasks"]:
+            continue
 
-        for page_num, page in enumerate(reader.pages):
-            try:
-                text = page.extract_text()
-            except Exception as e:
-                print(f"⚠️ Skipping page {page_num} in {fname}: {e}")
-                continue
+        chunks, metadata = _pdf_chunks(path, book["pages"])
+        report.append((
+            os.path.basename(path),
+            len(book["pages"]),
+            book["cpu"],
+            time.perf_counter() - began,
+        ))
+        del pending[path]
+        yield path, chunks, metadata
 
-            if text:
-                full_text += text + "\n"
+    if report:
+        elapsed = time.perf_counter() - began
+        total_pages = sum(r[1] for r in report)
+        print(f"PDF extraction ({workers} worker{'s' if workers > 1 else ''}):")
+        for fname, n_pages, cpu, done_at in report:
+            print(
+                f"  {fname}: {n_pages} pages, {cpu:.2f}s extract "
+                f"({n_pages / max(cpu, 1e-9):.1f} pages/s), done at {done_at:.2f}s"
+            )
+        print(f"  total: {total_pages} pages in {elapsed:.2f}s ({total_pages / max(elapsed, 1e-9):.1f} pages/s)")
 
-        if not full_text.strip():
-            print(f"⚠️ No extractable text in {fname}")
-            continue
 
-        chunks = chunk_text(full_text)
-        book_id = os.path.splitext(fname)[0]
+def _load_previous_store(version: StoreVersion | None):
+    """Previous chunk store + embeddings, or (None, None) if they can't be reused."""
+    if version is None or not os.path.exists(version.embeddings):
+        return None, None
+    chunks = load_chunks(version)
+    embeddings = np.load(version.embeddings, mmap_mode="r")
+    if len(embeddings) != len(chunks):
+        return None, None
+    return chunks, embeddings
 
-        for i, chunk in enumerate(chunks):
-            all_chunks.append(chunk)
-            metadata.append({
-                "doc_id": book_id,
-                "title": book_id.replace("_", " ").title(),
-                "chunk_id": f"{book_id}_chunk{i}",
-                "text": chunk,
-                "source": "pdf"
-            })
 
+def embed_batches(chunks: list[str], batch_size: int):
+    """Yield L2-normalized float32 embeddings, ``batch_size`` rows at a time."""
+    model = get_model()
+    for lo in range(0, len(chunks), batch_size):
+        batch = chunks[lo:lo + batch_size]
+        yield model.encode(
+            batch,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        ).astype(np.float32)
 
-def ingest_docs():
+
+def peak_rss_mb() -> float:
     """
-    Ingest JSON docs + PDF books into a single FAISS index.
+    Peak resident set size of this process so far, in MB. This is a
+    lifetime high-water mark: in a server process it includes the model
+    and earlier requests, not only the current ingest.
     """
-    all_chunks = []
-    metadata = []
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
 
-    ingest_json_docs(all_chunks, metadata)
-    ingest_pdf_books(all_chunks, metadata)
 
-    if not all_chunks:
-        raise RuntimeError("No documents found to ingest.")
+def _no_progress(stage: str, done: int = 0, total: int = 0):
+    pass
 
-    # Generate embeddings
-    embeddings = model.encode(
-        all_chunks,
-        show_progress_bar=True
-    )
 
-    embedding_dim = embeddings.shape[1]
+def ingest_docs(force: bool = False, progress=_no_progress) -> dict:
+    """
+    Ingest JSON docs + PDF books into a new version of the vector store.
+
+    Only new or modified files (per the live version's manifest) are
+    parsed and embedded; rows of unchanged files are reused and rows of
+    deleted files dropped. When nothing changed the store is left alone,
+    unless the configured index type changed, in which case only the FAISS
+    index is rebuilt from the stored embeddings.
 
-    # Create FAISS index
-    index = faiss.IndexFlatL2(embedding_dim)
-    index.add(np.array(embeddings, dtype=np.float32))
+    The new version is written to a staging directory and published
+    atomically (see app.rag.index_store), then the engine is reloaded.
+    ``progress(stage, done, total)`` is called as work advances. Returns
+    the live version, its chunk count and how many chunks were embedded.
+    """
+    progress("waiting")
+    with index_store.ingest_lock():
+        return _ingest(force, progress)
+
+
+def _ingest(force: bool, progress) -> dict:
+    progress("scanning")
+    rss_before = peak_rss_mb()
+    spec = index_spec()
+    sources = scan_sources()
+    live = index_store.current()
+    old_metadata, old_embeddings = _load_previous_store(live)
+    previous, previous_spec = ({}, None)
+    if not force and old_metadata is not None:
+        previous, previous_spec = load_manifest(live.manifest)
+
+    diff, records = diff_sources(sources, previous)
 
-    # Save index + metadata
-    faiss.write_index(index, VECTOR_DB_PATH)
-    with open(VECTOR_DB_META_PATH, "wb") as f:
-        pickle.dump(metadata, f)
+    # A legacy (unversioned) store is never "up to date": it is carried
+    # over into the first version below, reusing all of its rows
+    if diff.is_empty and previous and live.name is not None:
+        if previous_spec != spec:
+            print(f"Index settings changed ({previous_spec} -> {spec}). Rebuilding FAISS index.")
+            progress("indexing")
+            staged = index_store.stage()
+            try:
+                index = index_from_embeddings(old_embeddings, spec, settings.EMBED_BATCH_SIZE)
+                faiss.write_index(index, staged.index)
+                index_store.carry_over(
+                    live, staged,
+                    index_store.CHUNKS_FILE, index_store.BM25_FILE, index_store.EMBEDDINGS_FILE,
+                )
+                save_manifest(staged.manifest, records, spec)
+                progress("publishing")
+                live = index_store.publish(staged)
+            except BaseException:
+                index_store.discard(staged)
+                raise
+            print(f"Rebuilt FAISS index for {len(old_metadata)} chunks into {live.name}.")
+            from app.rag.engine import reload_engine
+            reload_engine()
+            return {"version": live.name, "chunks": len(old_metadata), "embedded": 0}
+        if records != previous:
+            # Only stat data changed; the manifest is replaced atomically
+            save_manifest(live.manifest, records, spec)
+        print(f"Vector store up to date ({len(old_metadata)} chunks). Skipping ingestion.")
+        return {"version": live.name, "chunks": len(old_metadata), "embedded": 0}
+
+    print(
+        f"Ingest plan: {len(diff.changed)} new/changed, "
+        f"{len(diff.unchanged)} unchanged, {len(diff.deleted)} deleted"
+    )
+    staged = index_store.stage()
+    try:
+        total, new_chunks = _build(staged, sources, diff, records, old_metadata, old_embeddings, spec, progress)
+        save_manifest(staged.manifest, records, spec)
+        progress("publishing")
+        live = index_store.publish(staged)
+    except BaseException:
+        index_store.discard(staged)
+        raise
 
-    print(f"Ingested {len(all_chunks)} chunks total.")
+    print(f"Ingested {total} chunks total ({new_chunks} newly embedded) into {live.name}.")
     print(f"- JSON + PDF sources combined")
+    # How far this run raised the high-water mark (0 if it stayed below it)
+    rss_peak = peak_rss_mb()
+    print(f"- Process peak RSS: {rss_peak:.1f} MB (+{rss_peak - rss_before:.1f} MB during this ingest)")
+
+    # Swap the live retrieval engine over to the freshly published version
+    from app.rag.engine import reload_engine
+    reload_engine()
+    return {"version": live.name, "chunks": total, "embedded": new_chunks}
+
+
+def _build(staged: StoreVersion, sources, diff, records, old_metadata, old_embeddings, spec, progress):
+    """
+    Write index, chunk store, embeddings and BM25 of the new version into
+    ``staged``. Chunks stream through: texts go straight to the chunk store
+    file and BM25 postings are packed as each file finishes, so memory
+    holds one file's chunks at a time rather than the whole corpus.
+    Returns (total chunks, newly embedded chunks).
+    """
+    embedding_dim = get_model().get_sentence_embedding_dimension()
+    batch_size = settings.EMBED_BATCH_SIZE
+    key_by_path = {sources[k][0]: k for k in diff.changed}
+
+    # Flat/HNSW grow as batches stream in; IVF variants are trained on the
+    # finished embedding file instead (nlist depends on the row count)
+    index = None if requires_training(spec) else new_index(embedding_dim, spec)
+    bm25 = BM25Builder()
+    new_chunks = 0
+    files_done = 0
+    failed: set[str] = set()
+
+    with NpyAppender(staged.embeddings, embedding_dim) as writer, ChunkStoreWriter(staged.chunks) as store:
+        def sink(vectors):
+            if index is not None:
+                index.add(vectors)
+            writer.write(vectors)
+
+        def add_chunks(chunk_meta):
+            for m in chunk_meta:
+                store.add(m)
+                bm25.add(m["text"])
+
+        # 1. Carry over rows of unchanged files straight from the old mmaps
+        for key in diff.unchanged:
+            record = records[key]
+            start = len(store)
+            for lo in range(record.chunk_start, record.chunk_end, batch_size):
+                hi = min(lo + batch_size, record.chunk_end)
+                add_chunks(old_metadata.records(lo, hi))
+                sink(np.asarray(old_embeddings[lo:hi], dtype=np.float32))
+            record.chunk_start, record.chunk_end = start, len(store)
+
+        # 2. Embed new/changed files batch by batch as extraction yields them
+        progress("embedding", 0, len(diff.changed))
+        for path, chunks, file_meta in chain(
+            ingest_json_docs([sources[k][0] for k in diff.changed if sources[k][1] == "json"]),
+            ingest_pdf_books([sources[k][0] for k in diff.changed if sources[k][1] == "pdf"], failed=failed),
+        ):
+            record = records[key_by_path[path]]
+            start = len(store)
+            for vectors in embed_batches(chunks, batch_size):
+                sink(vectors)
+            add_chunks(file_meta)
+            new_chunks += len(chunks)
+            record.chunk_start, record.chunk_end = start, len(store)
+            files_done += 1
+            progress("embedding", files_done, len(diff.changed))
+
+        total = len(store)
+        if not total:
+            raise RuntimeError("No documents found to ingest.")
+
+    # Left out of the manifest, so the next ingest reads them again
+    for path in sorted(failed):
+        print(f"⚠️ {os.path.basename(path)} was not fully read; it will be retried on the next ingest")
+        del records[key_by_path[path]]
+
+    progress("indexing")
+    if index is None:
+        index = index_from_embeddings(np.load(staged.embeddings, mmap_mode="r"), spec, batch_size)
+
+    faiss.write_index(index, staged.index)
+    # Precompute the BM25 inverted index so queries never rebuild it
+    bm25.finish().save(staged.bm25)
+    return total, new_chunks
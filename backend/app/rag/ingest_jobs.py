@@ -0,0 +1,266 @@
+# backend/app/rag/ingest_jobs.py
+"""
+Background ingestion jobs behind POST /rag/ingest.
+
+Uploaded files are streamed to temp files next to their destination in
+app/data/docs (JSON) or app/data/books (PDF), validated and renamed into
+place, then a job row is queued for the single ingest worker thread. The worker runs ingest_docs(), which
+builds a new store version next to the live one and publishes it
+atomically, so queries keep being answered from the old version until the
+new one is swapped in. Job state lives in the database, so any server
+process can report on a job started by another. Jobs whose process died
+before finishing are marked failed when the server starts again.
+"""
+import contextvars
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from app.core.config import settings, DOCS_PATH
+from app.core.executors import ingest_executor
+from app.core.metrics import metrics
+from app.core.tracing import log_event, record_stage
+from app.db.models import IngestJob
+from app.db.session import SessionLocal
+from app.rag.ingest import BOOKS_PATH, DATA_DIR, ingest_docs
+from app.rag.pdf_extract import count_pages
+
+UPLOAD_DIRS = {".json": DOCS_PATH, ".pdf": str(BOOKS_PATH)}
+COPY_BLOCK_BYTES = 1 << 20
+# Progress is written at most this often (stage changes always are)
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+def upload_name(filename: str | None) -> str:
+    """
+    Safe file name for an upload: no directories, a supported extension
+    (lower-cased, as scan_sources expects). Raises ValueError otherwise.
+    """
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    stem, ext = os.path.splitext(name)
+    ext = ext.lower()
+    if not stem or name.startswith("."):
+        raise ValueError(f"Invalid file name {filename!r}")
+    if ext not in UPLOAD_DIRS:
+        raise ValueError(f"{name}: only .pdf and .json files can be ingested")
+    return stem + ext
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def _copy_limited(src, path: str, limit: int):
+    """Copy file object ``src`` to ``path`` block by block, up to ``limit`` bytes."""
+    written = 0
+    with open(path, "wb") as f:
+        for block in iter(lambda: src.read(COPY_BLOCK_BYTES), b""):
+            written += len(block)
+            if written > limit:
+                raise UploadTooLarge(f"exceeds {settings.INGEST_MAX_UPLOAD_MB} MB")
+            f.write(block)
+
+
+def _check_json_docs(name: str, path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            docs = json.load(f)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"{name}: not valid UTF-8 JSON ({e})") from None
+    if not isinstance(docs, list) or not docs:
+        raise ValueError(f"{name}: expected a non-empty list of documents")
+    for i, doc in enumerate(docs):
+        if not isinstance(doc, dict) or not all(isinstance(doc.get(k), str) for k in ("id", "title", "body")):
+            raise ValueError(f"{name}: document {i} needs string 'id', 'title' and 'body' fields")
+        if not doc["id"].strip():
+            raise ValueError(f"{name}: document {i} has an empty id")
+
+
+def _check_upload(name: str, path: str):
+    if name.endswith(".json"):
+        _check_json_docs(name, path)
+        return
+    with open(path, "rb") as f:
+        if f.read(5) != b"%PDF-":
+            raise ValueError(f"{name}: not a PDF file")
+    try:
+        count_pages(path)
+    except Exception as e:
+        raise ValueError(f"{name}: unreadable PDF ({e})") from None
+
+
+def store_uploads(uploads: list[tuple[str, object]], replace: bool = False) -> list[str]:
+    """
+    Stream every ``(filename, file object)`` pair to a temp file, validate
+    it, then rename them all into the source directories. Nothing lands
+    unless every file is valid and within INGEST_MAX_UPLOAD_MB (else
+    UploadTooLarge), and existing sources are only overwritten with
+    ``replace`` (otherwise FileExistsError). Returns the stored paths
+    relative to app/data.
+    """
+    targets, seen = [], set()
+    for filename, src in uploads:
+        name = upload_name(filename)
+        if name in seen:
+            raise ValueError(f"{name} is uploaded twice")
+        seen.add(name)
+        path = os.path.join(UPLOAD_DIRS[os.path.splitext(name)[1]], name)
+        if not replace and os.path.exists(path):
+            raise FileExistsError(f"{name} already exists; set replace to overwrite it")
+        targets.append((name, src, path))
+
+    limit = settings.INGEST_MAX_UPLOAD_MB * 1024 * 1024
+    staged = []
+    try:
+        for name, src, path in targets:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Dot-prefixed and without the extension: scan_sources skips it
+            tmp = os.path.join(os.path.dirname(path), f".{name}.{uuid.uuid4().hex[:8]}.part")
+            staged.append((tmp, path))
+            try:
+                _copy_limited(src, tmp, limit)
+            except UploadTooLarge as e:
+                raise UploadTooLarge(f"{name} {e}") from None
+            _check_upload(name, tmp)
+    except BaseException:
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+
+    stored = []
+    for tmp, path in staged:
+        os.replace(tmp, path)
+        stored.append(os.path.relpath(path, DATA_DIR))
+    return stored
+
+
+def job_dict(job: IngestJob) -> dict:
+    """API representation of a job."""
+    return {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": {"done": job.progress_done, "total": job.progress_total},
+        "files": json.loads(job.files) if job.files else [],
+        "force": bool(job.force),
+        "index_version": job.index_version,
+        "chunks": job.chunks,
+        "embedded": job.embedded,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def worker_id() -> str:
+    """Identifies this server process in IngestJob.worker."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _update(job_id: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(IngestJob).filter(IngestJob.id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+class _Progress:
+    """ingest_docs progress callback that records the job's stage."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.stage = None
+        self.written_at = 0.0
+
+    def __call__(self, stage: str, done: int = 0, total: int = 0):
+        now = time.monotonic()
+        if stage == self.stage and now - self.written_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.stage, self.written_at = stage, now
+        _update(self.job_id, stage=stage, progress_done=done, progress_total=total)
+
+
+def submit(job_id: int):
+    """Queue a created job on the ingest worker; returns immediately."""
+    # Carry the trace id of the request that started it into the logs
+    ingest_executor.submit(contextvars.copy_context().run, run_job, job_id)
+
+
+def _is_dead(worker: str | None) -> bool:
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False  # another machine's job; it recovers its own
+    if int(pid) == os.getpid():
+        return True  # an earlier process that had our pid is gone
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def fail_interrupted_jobs() -> int:
+    """
+    Mark queued/running jobs whose server process no longer exists as
+    failed, so clients polling them get an answer. Called at startup.
+    """
+    db = SessionLocal()
+    try:
+        jobs = db.query(IngestJob).filter(IngestJob.status.in_(("queued", "running"))).all()
+        stale = [job for job in jobs if _is_dead(job.worker)]
+        ids = [job.id for job in stale]
+        for job in stale:
+            job.status = "failed"
+            job.error = "interrupted: the server stopped before the job finished"
+            job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+    if ids:
+        log_event("ingest_jobs_interrupted", level=logging.WARNING, jobs=ids)
+    return len(ids)
+
+
+def run_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+        force = bool(job.force) if job else False
+    finally:
+        db.close()
+    if job is None:
+        return
+
+    _update(job_id, status="running", started_at=datetime.utcnow())
+    start = time.perf_counter()
+    try:
+        result = ingest_docs(force=force, progress=_Progress(job_id))
+    except Exception as e:
+        metrics.inc("ingest_jobs_failed")
+        log_event("ingest_job_error", level=logging.WARNING, job_id=job_id, error=str(e))
+        _update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        return
+
+    metrics.inc("ingest_jobs_succeeded")
+    record_stage("ingest_job", time.perf_counter() - start, job_id=job_id, **result)
+    _update(
+        job_id,
+        status="succeeded",
+        stage="done",
+        # Progress of the final stage: chunks in the published version
+        progress_done=result["chunks"],
+        progress_total=result["chunks"],
+        index_version=result["version"],
+        chunks=result["chunks"],
+        embedded=result["embedded"],
+        finished_at=datetime.utcnow(),
+    )
@@ -1,22 +1,112 @@
 #backend\app\rag\llm.py
-from groq import Groq
+from typing import AsyncIterator
+from groq import Groq, AsyncGroq
 from app.core.config import settings
-from app.rag.prompt import build_prompt
+from app.core.executors import retrieval_executor, run_in_executor
+from app.core.tracing import stage
+from app.rag.prompt import build_prompt, build_summary_prompt
 
-client = Groq(api_key=settings.GROQ_API_KEY)
+LLM_MODEL = "llama-3.1-8b-instant"
+LLM_TEMPERATURE = 0.2
+LLM_MAX_TOKENS = 512
+SUMMARY_MAX_TOKENS = 320
+
+client = Groq(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_BASE_URL)
+async_client = AsyncGroq(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_BASE_URL)
 
 def generate_answer(
     context_chunks: list[str],
     question: str,
-    conversation: list[dict]
+    conversation: list[dict],
+    usage: dict | None = None,
+    summary: str | None = None
 ) -> str:
-    messages = build_prompt(context_chunks, question, conversation)
+    with stage("prompt"):
+        messages = build_prompt(context_chunks, question, conversation, usage, summary)
+
+    with stage("llm"):
+        completion = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_completion_tokens=LLM_MAX_TOKENS
+        )
+
+    return completion.choices[0].message.content.strip()
+
 
+def summarize_conversation(previous_summary: str | None, messages: list[dict]) -> str:
+    """Fold ``messages`` into the rolling session summary (blocking)."""
     completion = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=messages,
-        temperature=0.2,
-        max_completion_tokens=512
+        model=LLM_MODEL,
+        messages=build_summary_prompt(previous_summary, messages),
+        temperature=0.0,
+        max_completion_tokens=SUMMARY_MAX_TOKENS
     )
 
     return completion.choices[0].message.content.strip()
+
+
+async def _build_prompt_async(
+    context_chunks: list[str],
+    question: str,
+    conversation: list[dict],
+    usage: dict | None,
+    summary: str | None
+) -> list[dict]:
+    """
+    build_prompt() on the retrieval executor: tokenizing, truncation and
+    de-duplication are CPU work that would otherwise stall the event loop.
+    """
+    with stage("prompt"):
+        return await run_in_executor(
+            retrieval_executor, build_prompt, context_chunks, question, conversation, usage, summary
+        )
+
+
+async def generate_answer_async(
+    context_chunks: list[str],
+    question: str,
+    conversation: list[dict],
+    usage: dict | None = None,
+    summary: str | None = None
+) -> str:
+    """Awaitable generate_answer(); holds no thread while Groq responds."""
+    messages = await _build_prompt_async(context_chunks, question, conversation, usage, summary)
+
+    with stage("llm"):
+        completion = await async_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_completion_tokens=LLM_MAX_TOKENS
+        )
+
+    return completion.choices[0].message.content.strip()
+
+
+async def stream_answer(
+    context_chunks: list[str],
+    question: str,
+    conversation: list[dict],
+    usage: dict | None = None,
+    summary: str | None = None
+) -> AsyncIterator[str]:
+    """Yield answer text deltas as the async Groq client streams them."""
+    messages = await _build_prompt_async(context_chunks, question, conversation, usage, summary)
+
+    with stage("llm", stream=True):
+        stream = await async_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_completion_tokens=LLM_MAX_TOKENS,
+            stream=True
+        )
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
@@ -0,0 +1,120 @@
+# backend/app/rag/manifest.py
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+# 2: embeddings are L2-normalized and indexed by inner product
+MANIFEST_VERSION = 2
+
+
+@dataclass
+class FileRecord:
+    """One ingested source file and the chunk rows it owns in the store."""
+    path: str
+    source: str  # "json" | "pdf"
+    size: int
+    mtime: float
+    sha256: str
+    chunk_start: int = 0
+    chunk_end: int = 0
+
+
+@dataclass
+class ManifestDiff:
+    unchanged: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)  # new or modified
+    deleted: list[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.changed and not self.deleted
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(path: str) -> tuple[dict[str, FileRecord], dict | None]:
+    """
+    Load the manifest: file records plus the index spec the store was
+    built with. A missing or unreadable file means 'nothing ingested'.
+    """
+    if not os.path.exists(path):
+        return {}, None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}, None
+    if data.get("version") != MANIFEST_VERSION:
+        return {}, None
+    records = {rec["path"]: FileRecord(**rec) for rec in data.get("files", [])}
+    return records, data.get("index")
+
+
+def save_manifest(path: str, records: dict[str, FileRecord], index: dict | None = None):
+    """Write atomically so a crash never leaves a half-written manifest."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": MANIFEST_VERSION,
+                "index": index,
+                "files": [asdict(r) for r in sorted(records.values(), key=lambda r: r.path)],
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp, path)
+
+
+def diff_sources(
+    sources: dict[str, tuple[str, str]],
+    previous: dict[str, FileRecord],
+) -> tuple[ManifestDiff, dict[str, FileRecord]]:
+    """
+    Compare the files currently on disk with the previous manifest.
+
+    ``sources`` maps a manifest key to ``(absolute path, source type)``.
+    Size + mtime is checked first; the file is only hashed when those
+    differ, so an unchanged corpus costs one ``stat`` per file.
+
+    Returns the diff and fresh records for every current file (chunk ranges
+    are carried over for unchanged files and filled in later for the rest).
+    """
+    diff = ManifestDiff()
+    records: dict[str, FileRecord] = {}
+
+    for key in sorted(sources):
+        abs_path, source = sources[key]
+        st = os.stat(abs_path)
+        old = previous.get(key)
+
+        if old and old.size == st.st_size and old.mtime == st.st_mtime:
+            records[key] = old
+            diff.unchanged.append(key)
+            continue
+
+        digest = file_sha256(abs_path)
+        record = FileRecord(
+            path=key,
+            source=source,
+            size=st.st_size,
+            mtime=st.st_mtime,
+            sha256=digest,
+        )
+        if old and old.sha256 == digest:
+            # Touched but identical: keep its rows, refresh the stat info
+            record.chunk_start, record.chunk_end = old.chunk_start, old.chunk_end
+            diff.unchanged.append(key)
+        else:
+            diff.changed.append(key)
+        records[key] = record
+
+    diff.deleted = sorted(set(previous) - set(sources))
+    return diff, records
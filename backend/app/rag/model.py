@@ -0,0 +1,36 @@
+# backend/app/rag/model.py
+import threading
+import time
+from app.core.config import EMBEDDING_MODEL
+
+_model = None
+_model_lock = threading.Lock()
+_load_seconds: float | None = None
+
+
+def get_model():
+    """
+    Return the shared SentenceTransformer, loading it on first use.
+
+    sentence_transformers (and torch) are imported here rather than at
+    module level so importing the app stays cheap.
+    """
+    global _model, _load_seconds
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                start = time.perf_counter()
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(EMBEDDING_MODEL)
+                _load_seconds = round(time.perf_counter() - start, 3)
+                print(f"Loaded embedding model {EMBEDDING_MODEL} in {_load_seconds}s")
+                _model = model
+    return _model
+
+
+def is_model_loaded() -> bool:
+    return _model is not None
+
+
+def model_load_seconds() -> float | None:
+    return _load_seconds
@@ -0,0 +1,53 @@
+# backend/app/rag/npy_writer.py
+import numpy as np
+
+
+class NpyAppender:
+    """
+    Append fixed-width float32 rows to a .npy file without holding them.
+
+    The header is written up front with a zero row count and rewritten in
+    place on close(); for any realistic row count the padded header keeps
+    the same length, so the rows never have to be copied. The result loads
+    with ``np.load(path, mmap_mode="r")``.
+    """
+
+    def __init__(self, path: str, dim: int, dtype=np.float32):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._f = open(path, "wb")
+        self._write_header()
+        self._data_offset = self._f.tell()
+
+    def _write_header(self):
+        np.lib.format.write_array_header_1_0(self._f, {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.rows, self.dim),
+        })
+
+    def write(self, rows: np.ndarray):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if rows.ndim != 2 or rows.shape[1] != self.dim:
+            raise ValueError(f"Expected rows of width {self.dim}, got shape {rows.shape}")
+        self._f.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def close(self):
+        self._f.seek(0)
+        self._write_header()
+        if self._f.tell() != self._data_offset:
+            self._f.close()
+            raise RuntimeError(f"npy header for {self.rows} rows no longer fits in {self.path}")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
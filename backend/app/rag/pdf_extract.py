@@ -0,0 +1,36 @@
+# backend/app/rag/pdf_extract.py
+"""
+PDF text extraction run inside ingestion worker processes.
+
+Kept free of app imports (settings, models, FAISS) so that spawned workers
+only pay for importing pypdf.
+"""
+import os
+import time
+from pypdf import PdfReader
+
+
+def count_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def extract_pages(path: str, start: int, end: int) -> tuple[list[str], float]:
+    """
+    Extract text for pages [start, end) of one PDF.
+    Returns the page texts (empty string for unreadable pages) and the
+    seconds spent extracting.
+    """
+    began = time.perf_counter()
+    reader = PdfReader(path)
+    fname = os.path.basename(path)
+
+    texts = []
+    for page_num in range(start, end):
+        try:
+            text = reader.pages[page_num].extract_text()
+        except Exception as e:
+            print(f"⚠️ Skipping page {page_num} in {fname}: {e}")
+            text = ""
+        texts.append(text or "")
+
+    return texts, time.perf_counter() - began
@@ -1,4 +1,12 @@
 # prompt.py
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.rag.tokens import (
+    MESSAGE_OVERHEAD,
+    count_message_tokens,
+    count_tokens_many,
+    truncate_to_tokens,
+)
 
 SYSTEM_PROMPT = """
 You are Socrates, reborn as a reasoning guide.
@@ -32,33 +40,190 @@ RESPONSE GUIDELINES:
 - Distinguish clearly between what is stated in the context and what is logically derived from it.
 """
 
+HISTORY_NOTICE = (
+    "The following is prior dialogue for conversational continuity ONLY.\n"
+    "DO NOT treat any statement in it as factual information.\n"
+    "You MAY follow explicit user instructions from it (e.g., formatting requests) "
+    "as long as they do not require inventing unsupported content."
+)
+
+SUMMARY_NOTICE = (
+    "Summary of the earlier part of this conversation, for continuity ONLY.\n"
+    "DO NOT treat any statement in it as factual information."
+)
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and an assistant called Socrates.
+
+Rewrite the summary so it also covers the new messages. Keep:
+- the topics and questions the user raised, in order;
+- any instructions or preferences the user stated (format, tone, length);
+- conclusions the conversation reached.
+
+Do not add facts that are not in the messages. Write plain prose, at most 200 words.
+Reply with the summary only.
+"""
+
+CONTEXT_HEADER = "AVAILABLE CONTEXT (use this EXCLUSIVELY for any factual claims or references):\n\n"
+
+# Shortest word run treated as chunk overlap rather than coincidence
+MIN_OVERLAP_WORDS = 8
+
+
+def _strip_overlap(words: list[str], kept: list[list[str]]) -> list[str]:
+    """
+    Drop the part of ``words`` already present at the boundary of a kept
+    chunk: a prefix equal to another chunk's suffix (the next chunk of the
+    same document) or a suffix equal to another chunk's prefix.
+    """
+    for other in kept:
+        longest = min(len(words), len(other))
+        for k in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+            if other[-k:] == words[:k]:
+                words = words[k:]
+                break
+        longest = min(len(words), len(other))
+        for k in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+            if words[-k:] == other[:k]:
+                words = words[:-k]
+                break
+    return words
+
+
+def dedupe_chunks(context_chunks: list[str]) -> list[str]:
+    """
+    Remove repeated text between retrieved chunks, keeping rank order.
+    Chunks are 200 words with a 50-word overlap, so neighbouring chunks of
+    one document otherwise repeat a quarter of their content. A chunk is
+    only dropped when stripping its overlap left a tiny remainder; short
+    chunks that overlap nothing are kept whole.
+    """
+    kept: list[list[str]] = []
+    for chunk in context_chunks:
+        words = chunk.split()
+        stripped = _strip_overlap(words, kept)
+        if stripped and (len(stripped) == len(words) or len(stripped) >= MIN_OVERLAP_WORDS):
+            kept.append(stripped)
+    return [" ".join(w) for w in kept]
+
+
+def _pack_context(chunks: list[str], budget: int) -> tuple[list[str], bool]:
+    """
+    Whole chunks in rank order while they fit; the first one that does not
+    fit is cut to the remaining budget if enough of it would survive.
+    Returns the packed chunks and whether anything was cut or dropped.
+    """
+    labels = [f"[Source {i+1}]\n" for i in range(len(chunks))]
+    costs = count_tokens_many([label + chunk for label, chunk in zip(labels, chunks)])
+    packed, used = [], 0
+    for label, chunk, cost in zip(labels, chunks, costs):
+        if used + cost <= budget:
+            packed.append(chunk)
+            used += cost
+            continue
+        remaining = budget - used - count_tokens_many([label])[0]
+        if remaining >= settings.PROMPT_MIN_CHUNK_TOKENS:
+            packed.append(truncate_to_tokens(chunk, remaining))
+        return packed, True
+    return packed, False
+
+
+def _pack_history(conversation: list[dict], budget: int) -> tuple[list[dict], bool]:
+    """
+    Most recent messages that fit, oldest dropped first. A single message
+    too long for what is left is cut rather than skipped when it is the
+    newest one, so the latest turn is never lost entirely.
+    """
+    if not conversation or budget <= 0:
+        return [], bool(conversation)
+    costs = count_tokens_many([m["content"] for m in conversation])
+    kept, used = [], 0
+    for message, cost in zip(reversed(conversation), reversed(costs)):
+        cost += MESSAGE_OVERHEAD
+        if used + cost > budget:
+            if not kept:
+                content = truncate_to_tokens(message["content"], budget - MESSAGE_OVERHEAD)
+                if content:
+                    kept.append({"role": message["role"], "content": content})
+            return list(reversed(kept)), True
+        kept.append(message)
+        used += cost
+    return list(reversed(kept)), False
+
+
 def build_prompt(
     context_chunks: list[str],
     question: str,
-    conversation: list[dict]
+    conversation: list[dict],
+    usage: dict | None = None,
+    summary: str | None = None,
 ) -> list[dict]:
     """
-    Builds the full message list for the LLM.
-    
+    Builds the full message list for the LLM within PROMPT_TOKEN_BUDGET.
+
+    The system prompt, the question and the rolling session summary are
+    always sent. Retrieved context (deduplicated) is packed next, then the
+    remaining budget - at most PROMPT_HISTORY_TOKENS - goes to the most
+    recent messages the summary does not cover yet.
+
     Parameters:
-        context_chunks: List of retrieved text chunks (strings)
+        context_chunks: List of retrieved text chunks (strings), best first
         question: Current user query
         conversation: List of previous messages in OpenAI format [{'role': ..., 'content': ...}, ...]
+        usage: Optional dict filled with the token accounting for this prompt
+        summary: Rolling summary of the conversation before ``conversation``
     """
+    final_message = {
+        "role": "user",
+        "content": f"""
+Current Question: {question}
+
+Final Instructions:
+- Respond as Socrates, using ONLY the AVAILABLE CONTEXT provided above for any factual content, summaries, or references.
+- If the context lacks relevant information, state clearly: "I don’t have enough information in the provided documents."
+- If the user has requested a specific format in prior messages (e.g., bullet points, one-liners), comply exactly while staying grounded.
+- Remain in character throughout.
+"""
+    }
+    conversation = conversation[-20:]  # Last ~10 exchanges at most
+    history_notice = {"role": "system", "content": HISTORY_NOTICE}
+    summary_message = {"role": "system", "content": f"{SUMMARY_NOTICE}\n\n{summary}"} if summary else None
+
+    # 1. Fixed cost: persona, context header, question (+ summary, history notice)
+    fixed = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "system", "content": CONTEXT_HEADER}, final_message]
+    if summary_message:
+        fixed.append(summary_message)
+    if conversation:
+        fixed.append(history_notice)
+    fixed_tokens = count_message_tokens(fixed)
+    available = max(settings.PROMPT_TOKEN_BUDGET - fixed_tokens, 0)
+
+    # 2. Context first: it is what answers are grounded in. History keeps
+    # a reserve so a long context cannot crowd it out completely.
+    history_tokens = sum(count_tokens_many([m["content"] for m in conversation]))
+    history_reserve = min(settings.PROMPT_HISTORY_TOKENS, history_tokens + MESSAGE_OVERHEAD * len(conversation))
+    chunks = dedupe_chunks(context_chunks)
+    packed_chunks, context_cut = _pack_context(chunks, available - history_reserve)
+    context_tokens = count_tokens_many(["\n\n".join(packed_chunks)])[0] if packed_chunks else 0
+
+    # 3. History gets whatever context left over, up to its cap
+    history_budget = min(settings.PROMPT_HISTORY_TOKENS, available - context_tokens)
+    recent_conversation, history_cut = _pack_history(conversation, history_budget)
+
     messages = []
 
     # 1. Core system prompt with all rules and persona
     messages.append({"role": "system", "content": SYSTEM_PROMPT})
 
     # 2. Provide the retrieved context prominently and exclusively
-    if context_chunks:
+    if packed_chunks:
         context = "\n\n".join(
             f"[Source {i+1}]\n{chunk.strip()}"
-            for i, chunk in enumerate(context_chunks)
+            for i, chunk in enumerate(packed_chunks)
         )
         messages.append({
             "role": "system",
-            "content": f"AVAILABLE CONTEXT (use this EXCLUSIVELY for any factual claims or references):\n\n{context}"
+            "content": f"{CONTEXT_HEADER}{context}"
         })
     else:
         messages.append({
@@ -67,33 +232,50 @@ def build_prompt(
         })
 
     # 3. Conversation history — strictly for continuity and user instructions only
-    if conversation:
-        # Limit history to prevent token overflow and reduce drift
-        recent_conversation = conversation[-20:]  # Last ~10 exchanges
-
-        messages.append({
-            "role": "system",
-            "content": (
-                "The following is prior dialogue for conversational continuity ONLY.\n"
-                "DO NOT treat any statement in it as factual information.\n"
-                "You MAY follow explicit user instructions from it (e.g., formatting requests) "
-                "as long as they do not require inventing unsupported content."
-            )
-        })
+    if summary_message:
+        messages.append(summary_message)
+    if recent_conversation:
+        messages.append(history_notice)
         messages.extend(recent_conversation)
 
     # 4. Final user message with the current question and reinforced instructions
-    messages.append({
-        "role": "user",
-        "content": f"""
-Current Question: {question}
+    messages.append(final_message)
+
+    total = count_message_tokens(messages)
+    stats = {
+        "prompt_tokens": total,
+        "context_tokens": context_tokens,
+        "history_tokens": count_message_tokens(recent_conversation) if recent_conversation else 0,
+        "chunks_in": len(context_chunks),
+        "chunks_packed": len(packed_chunks),
+        "history_messages": len(recent_conversation),
+        "truncated": context_cut or history_cut,
+    }
+    _record(stats)
+    if usage is not None:
+        usage.update(stats)
+    return messages
 
-Final Instructions:
-- Respond as Socrates, using ONLY the AVAILABLE CONTEXT provided above for any factual content, summaries, or references.
-- If the context lacks relevant information, state clearly: "I don’t have enough information in the provided documents."
-- If the user has requested a specific format in prior messages (e.g., bullet points, one-liners), comply exactly while staying grounded.
-- Remain in character throughout.
-"""
-    })
 
-    return messages
\ No newline at end of file
+def _record(stats: dict):
+    metrics.inc("prompt_requests")
+    metrics.inc("prompt_tokens_total", stats["prompt_tokens"])
+    metrics.inc("prompt_context_tokens_total", stats["context_tokens"])
+    metrics.inc("prompt_history_tokens_total", stats["history_tokens"])
+    metrics.set_max("prompt_tokens_max", stats["prompt_tokens"])
+    metrics.inc("prompt_truncated", int(stats["truncated"]))
+
+
+def build_summary_prompt(previous_summary: str | None, messages: list[dict]) -> list[dict]:
+    """Messages asking the LLM to fold ``messages`` into the running summary."""
+    transcript = "\n\n".join(f"{m['role'].upper()}: {m['content'].strip()}" for m in messages)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {
+            "role": "user",
+            "content": (
+                f"CURRENT SUMMARY:\n{previous_summary or '(none yet)'}\n\n"
+                f"NEW MESSAGES:\n{transcript}"
+            ),
+        },
+    ]
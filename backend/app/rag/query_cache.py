@@ -0,0 +1,246 @@
+# backend/app/rag/query_cache.py
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from app.core.cache import TTLCache
+from app.core.config import settings, EMBEDDING_MODEL
+from app.core.metrics import metrics
+from app.db.session import sqlite_pragmas
+from app.rag.model import get_model
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form used as the cache key and as the text that is encoded:
+    NFKC, lower-cased, whitespace collapsed, trailing punctuation dropped.
+    MiniLM is uncased, so lower-casing does not change the embedding.
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _WS.sub(" ", text).strip()
+    return text.strip(" \"'").rstrip("?!.。 ")
+
+
+def l2_normalize(vec: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vec, axis=-1, keepdims=True)
+    return (vec / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class PersistentEmbeddingStore:
+    """
+    SQLite-backed second tier so cached embeddings survive restarts.
+
+    Bounded like the memory tier: rows unused for ``ttl`` seconds are
+    expired and, past ``max_rows``, the least recently used are evicted
+    (down to PRUNE_TO of the cap, so pruning is not paid on every insert).
+    Every server worker shares the file: a read or write that still fails
+    after SQLITE_BUSY_TIMEOUT_MS counts as a miss instead of failing the
+    request.
+    """
+
+    PRUNE_TO = 0.9
+
+    def __init__(self, path: str, model_name: str, max_rows: int = 0, ttl: float | None = None):
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        sqlite_pragmas(self._conn)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL,"
+            " PRIMARY KEY (model, query))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(query_embeddings)")}
+        if "last_used" not in columns:
+            # Files written before eviction existed
+            self._conn.execute("ALTER TABLE query_embeddings ADD COLUMN last_used REAL")
+            self._conn.execute("UPDATE query_embeddings SET last_used = created_at")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_query_embeddings_last_used ON query_embeddings (last_used)"
+        )
+        self._conn.commit()
+        with self._lock:
+            self._safely(self._prune)
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            return self._safely(self._get, key)
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [
+            (self.model_name, key, vector.astype(np.float32).tobytes(), now, now)
+            for key, vector in items
+        ]
+        with self._lock:
+            self._safely(self._insert, rows)
+
+    def _safely(self, fn, *args):
+        """Run ``fn`` (lock held); a SQLite error rolls back and returns None."""
+        try:
+            return fn(*args)
+        except sqlite3.Error:
+            self._conn.rollback()
+            metrics.inc("query_cache_disk_errors")
+            return None
+
+    def _get(self, key: str) -> np.ndarray | None:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT vector, last_used FROM query_embeddings WHERE model = ? AND query = ?",
+            (self.model_name, key),
+        ).fetchone()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            return None
+        self._conn.execute(
+            "UPDATE query_embeddings SET last_used = ? WHERE model = ? AND query = ?",
+            (now, self.model_name, key),
+        )
+        self._conn.commit()
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _insert(self, rows: list[tuple]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)", rows
+        )
+        self._conn.commit()
+        self._rows += len(rows)  # upper bound: replaced rows count twice
+        if self.max_rows and self._rows > self.max_rows:
+            self._prune()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def _prune(self):
+        """Expire stale rows, evict LRU rows over the cap and recount (lock held)."""
+        if self.ttl:
+            self._conn.execute("DELETE FROM query_embeddings WHERE last_used < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        if self.max_rows and count > self.max_rows:
+            excess = count - int(self.max_rows * self.PRUNE_TO)
+            self._conn.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN ("
+                " SELECT rowid FROM query_embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            count -= excess
+        self._conn.commit()
+        self._rows = count
+
+
+class QueryEmbeddingCache:
+    """
+    LRU + TTL cache of query embeddings keyed on the normalized query,
+    with an optional persistent tier. Hit/miss counts go to ``metrics``.
+    """
+
+    def __init__(
+        self,
+        encode,
+        maxsize: int,
+        ttl: float | None,
+        persist_path: str = "",
+        persist_max_rows: int = 0,
+    ):
+        self._encode = encode
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._disk = None
+        if persist_path:
+            self._disk = PersistentEmbeddingStore(persist_path, EMBEDDING_MODEL, persist_max_rows, ttl)
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        vec = self._memory.get(key)
+        if vec is not None:
+            metrics.inc("query_cache_hits")
+            return vec
+
+        if self._disk is not None:
+            stored = self._disk.get(key)
+            if stored is not None:
+                vec = l2_normalize(stored.reshape(1, -1))
+                self._memory.set(key, vec)
+                metrics.inc("query_cache_hits")
+                metrics.inc("query_cache_disk_hits")
+                return vec
+        return None
+
+    def get(self, query: str) -> np.ndarray:
+        """Return the (1, dim) unit-length float32 embedding for ``query``."""
+        return self.get_many([query])
+
+    def get_many(self, queries: list[str]) -> np.ndarray:
+        """
+        Return a (len(queries), dim) matrix of unit-length embeddings.
+        All cache misses are encoded together in one batched call.
+        """
+        keys = [normalize_query(q) or q for q in queries]
+        found = {}
+        missing = {}  # ordered set of keys to encode
+        for key in keys:
+            if key in found or key in missing:
+                continue
+            vec = self._lookup(key)
+            if vec is None:
+                missing[key] = None
+            else:
+                found[key] = vec
+        missing = list(missing)
+
+        if missing:
+            metrics.inc("query_cache_misses", len(missing))
+            encoded = l2_normalize(np.asarray(self._encode(missing), dtype=np.float32))
+            for key, row in zip(missing, encoded):
+                vec = row.reshape(1, -1)
+                vec.setflags(write=False)  # shared between requests
+                self._memory.set(key, vec)
+                found[key] = vec
+            if self._disk is not None:
+                self._disk.set_many(zip(missing, encoded))
+
+        if len(keys) == 1:
+            return found[keys[0]]
+        return np.vstack([found[k] for k in keys])
+
+    def clear(self):
+        self._memory.clear()
+
+
+_cache: QueryEmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache() -> QueryEmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryEmbeddingCache(
+                    lambda texts: get_model().encode(texts),
+                    maxsize=settings.QUERY_CACHE_SIZE,
+                    ttl=settings.QUERY_CACHE_TTL_SECONDS or None,
+                    persist_path=settings.QUERY_CACHE_PATH,
+                    persist_max_rows=settings.QUERY_CACHE_DISK_ROWS,
+                )
+    return _cache
+
+
+def encode_query(query: str) -> np.ndarray:
+    """Embed a single query through the process-wide cache."""
+    return _get_cache().get(query)
+
+
+def encode_queries(queries: list[str]) -> np.ndarray:
+    """Embed many queries through the cache with one encode() for the misses."""
+    return _get_cache().get_many(queries)
@@ -2,72 +2,62 @@
 import os
 import pickle
 import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from rank_bm25 import BM25Okapi
-from app.core.config import VECTOR_DB_PATH, VECTOR_DB_META_PATH
+from app.rag import index_store
+from app.rag.bm25 import BM25Index
+from app.rag.chunk_store import ChunkStore
+from app.rag.index_store import StoreVersion
+from app.core.config import settings
 
-# Initialize model once
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+
+def load_chunks(version: StoreVersion | None = None) -> ChunkStore:
+    """
+    Map the chunk store of ``version`` (default: the live one). A legacy
+    metadata pickle is converted in memory; the next ingest replaces it.
+    """
+    version = version or index_store.current()
+    if version is None:
+        raise RuntimeError("Vector DB does not exist. Run /rag/ingest first.")
+    if not os.path.exists(version.chunks) and os.path.exists(version.legacy_meta):
+        with open(version.legacy_meta, "rb") as f:
+            return ChunkStore.from_records(pickle.load(f))
+    return ChunkStore.open(version.chunks)
 
 
-def load_index():
-    """Load FAISS index + metadata."""
-    if not os.path.exists(VECTOR_DB_PATH) or not os.path.exists(VECTOR_DB_META_PATH):
+def read_faiss_index(path: str) -> faiss.Index:
+    """
+    Read a FAISS index, memory-mapped when INDEX_MMAP is set.
+
+    IO_FLAG_MMAP_IFC (FAISS >= 1.10) maps the vector codes of Flat, HNSW
+    and IVF indexes in place, so every process serving the same file shares
+    one page-cache copy; older FAISS only has IO_FLAG_MMAP, which maps IVF
+    lists. Index types the flag cannot map are read into memory instead.
+    """
+    if settings.INDEX_MMAP:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            print(f"⚠️ Could not memory-map {os.path.basename(path)} ({e}); reading it into memory")
+    return faiss.read_index(path)
+
+
+def load_index(version: StoreVersion | None = None):
+    """Load FAISS index + chunk store, both from ``version`` (default: the live one)."""
+    version = version or index_store.current()
+    if version is None:
         raise RuntimeError("Vector DB does not exist. Run /rag/ingest first.")
-    index = faiss.read_index(VECTOR_DB_PATH)
-    with open(VECTOR_DB_META_PATH, "rb") as f:
-        metadata = pickle.load(f)
-    return index, metadata
+    return read_faiss_index(version.index), load_chunks(version)
 
 
-def build_bm25_index(metadata: list[dict]):
+def build_bm25_index(chunks: ChunkStore):
     """Build BM25 index from chunk text."""
-    tokenized = [m["text"].split() for m in metadata]
-    return BM25Okapi(tokenized)
+    return BM25Index.build(chunks.texts())
 
 
 def retrieve(query: str, top_k: int = 5):
     """
     Hybrid retrieval: FAISS embeddings + BM25 keyword search.
-    Returns top_k results with normalized scores and chunk text.
+    Delegates to the process-resident RetrievalEngine.
     """
-    index, metadata = load_index()
-
-    # --- Embedding search ---
-    vec = model.encode([query])
-    D, I = index.search(np.array(vec), top_k)
-    emb_results = []
-    for j, i in enumerate(I[0]):
-        emb_results.append({
-            **metadata[i],
-            "score": float(D[0][j])  # L2 distance (smaller = more similar)
-        })
-
-    # --- BM25 keyword search ---
-    bm25 = build_bm25_index(metadata)
-    tokenized_query = query.split()
-    bm25_scores = bm25.get_scores(tokenized_query)
-    bm25_results = []
-    for i in np.argsort(bm25_scores)[::-1][:top_k]:
-        bm25_results.append({
-            **metadata[i],
-            "score": float(bm25_scores[i])  # higher = more relevant
-        })
-
-    # --- Merge results (deduplicate by chunk_id) ---
-    combined = {r["chunk_id"]: r for r in emb_results + bm25_results}
-
-    # --- Normalize embedding scores to 0-1 similarity ---
-    if emb_results:
-        max_emb_score = max([r["score"] for r in emb_results])
-        for r in combined.values():
-            if r in emb_results:
-                # invert L2 distance to similarity
-                r["score"] = 1 / (1 + r["score"] / max_emb_score)
-
-    # Sort by score descending
-    sorted_results = sorted(combined.values(), key=lambda x: x["score"], reverse=True)
-
-    # Limit to top_k results
-    return sorted_results[:top_k]
+    from app.rag.engine import get_engine
+    return get_engine().retrieve(query, top_k)
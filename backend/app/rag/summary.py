@@ -0,0 +1,91 @@
+# backend/app/rag/summary.py
+"""
+Rolling conversation summaries, maintained off the request path.
+
+After each exchange the session is queued for the summary worker. Once
+more than SUMMARY_RECENT_MESSAGES + SUMMARY_TRIGGER_MESSAGES messages sit
+outside the summary, everything but the newest SUMMARY_RECENT_MESSAGES is
+folded into ``ChatSession.summary``. Prompts then carry the summary plus
+a short verbatim window, so their size and the history read stay bounded
+however long the session runs.
+"""
+import contextvars
+import logging
+import threading
+import time
+from app.core.config import settings
+from app.core.executors import summary_executor
+from app.core.metrics import metrics
+from app.core.tracing import log_event, record_stage
+from app.db.chat_memory import load_unsummarized, store_summary
+from app.db.session import SessionLocal
+from app.rag.llm import summarize_conversation
+
+_pending: set[int] = set()
+_pending_lock = threading.Lock()
+
+
+def history_window() -> int:
+    """
+    Messages to load verbatim: next to the summary, at most what can sit
+    outside it; with summaries off, the plain HISTORY_MESSAGES window.
+    """
+    if settings.SUMMARY_TRIGGER_MESSAGES <= 0:
+        return settings.HISTORY_MESSAGES
+    return settings.SUMMARY_RECENT_MESSAGES + settings.SUMMARY_TRIGGER_MESSAGES
+
+
+def schedule_summary(session_id: int):
+    """
+    Queue ``session_id`` for summarization. Returns immediately; repeated
+    calls while the session is already queued are coalesced.
+    """
+    if settings.SUMMARY_TRIGGER_MESSAGES <= 0:
+        return
+    with _pending_lock:
+        if session_id in _pending:
+            return
+        _pending.add(session_id)
+    # Carry the trace id of the request that triggered it into the logs
+    summary_executor.submit(contextvars.copy_context().run, _run, session_id)
+
+
+def _run(session_id: int):
+    with _pending_lock:
+        _pending.discard(session_id)
+    try:
+        summarize_session(session_id)
+    except Exception as e:
+        metrics.inc("summary_errors")
+        log_event("summary_error", level=logging.WARNING, session_id=session_id, error=str(e))
+
+
+def summarize_session(session_id: int) -> bool:
+    """Fold older messages into the summary if enough have piled up."""
+    db = SessionLocal()
+    try:
+        session, messages = load_unsummarized(db, session_id)
+        keep = settings.SUMMARY_RECENT_MESSAGES
+        if session is None or len(messages) < keep + settings.SUMMARY_TRIGGER_MESSAGES:
+            return False
+
+        fold = messages[:len(messages) - keep]
+        transcript = [{"role": m.role, "content": m.content} for m in fold]
+        through_id = fold[-1].id
+        previous_summary, previous_through = session.summary, session.summary_message_id
+        # Do not hold the read transaction open while the LLM works
+        db.rollback()
+
+        start = time.perf_counter()
+        summary = summarize_conversation(previous_summary, transcript)
+        elapsed = time.perf_counter() - start
+        if not summary:
+            return False
+
+        stored = store_summary(db, session_id, summary, through_id, previous_through)
+        if stored:
+            metrics.inc("summaries_written")
+            record_stage("summary", elapsed, session_id=session_id)
+        return stored
+    finally:
+        db.close()
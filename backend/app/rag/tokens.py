@@ -0,0 +1,72 @@
+# backend/app/rag/tokens.py
+"""
+Local token counting for prompt budgeting.
+
+Uses the embedding model's WordPiece tokenizer, which is already loaded
+for retrieval, so counting costs no extra memory or network. It is not
+the LLM's tokenizer, so counts are close rather than exact; the budget
+in settings leaves headroom for that.
+"""
+import re
+from app.rag.model import get_model
+
+# Chat-format overhead per message (role markers, separators)
+MESSAGE_OVERHEAD = 4
+
+_SENTENCE_END = re.compile(r"[.!?][\"'”’)\]]*\s")
+
+
+def _tokenizer():
+    return getattr(get_model(), "tokenizer", None)
+
+
+def _estimate(text: str) -> int:
+    # ~4 characters per token for English prose
+    return (len(text) + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    return count_tokens_many([text])[0]
+
+
+def count_tokens_many(texts: list[str]) -> list[int]:
+    """Token counts for several texts in one tokenizer call."""
+    if not texts:
+        return []
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return [_estimate(t) for t in texts]
+    ids = tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+    return [len(i) for i in ids]
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    counts = count_tokens_many([m["content"] for m in messages])
+    return sum(counts) + MESSAGE_OVERHEAD * len(messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Longest word prefix of ``text`` within ``max_tokens``, cut back to the
+    last sentence end when one falls in the final third of the prefix.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    words = text.split()
+    limit = max_tokens - 1  # room for the ellipsis
+    lo, hi = 0, len(words)
+    while lo < hi:  # binary search on the number of words kept
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = " ".join(words[:lo])
+
+    ends = [m.end() for m in _SENTENCE_END.finditer(prefix + " ")]
+    if ends and ends[-1] >= len(prefix) * 2 // 3:
+        return prefix[:ends[-1]].rstrip()
+    return prefix + " …" if prefix else ""
@@ -0,0 +1,121 @@
+# backend/benchmarks/ann_recall.py
+"""
+Recall@k vs latency for the ANN index types against the Flat baseline.
+
+Run from the backend directory:
+
+    python -m benchmarks.ann_recall --k 5 --queries 200 --json ann.json
+
+Uses the stored chunk embeddings (ingesting first if needed). Queries are
+the fixed question set plus a sample of chunk embeddings; ground truth is
+exact Flat search. Each index type is built in memory with the current
+HNSW_*/IVF_*/PQ_* settings and swept over efSearch / nprobe.
+"""
+import argparse
+import json
+import os
+import time
+import faiss
+import numpy as np
+from app.core.config import settings
+from app.rag import index_store
+from app.rag.index_factory import index_from_embeddings, search_params
+from app.rag.ingest import ingest_docs
+from app.rag.model import get_model
+from benchmarks.retrieval_latency import QUERIES
+
+EF_SEARCH = [16, 32, 64, 128, 256]
+NPROBE = [1, 4, 8, 16, 32]
+
+
+def build(embeddings: np.ndarray, kind: str):
+    spec = {"type": kind}
+    if kind == "hnsw":
+        spec.update(m=settings.HNSW_M, ef_construction=settings.HNSW_EF_CONSTRUCTION)
+    if kind in ("ivf", "ivfpq"):
+        spec.update(nlist=settings.IVF_NLIST)
+    if kind == "ivfpq":
+        spec.update(pq_m=settings.PQ_M, pq_nbits=settings.PQ_NBITS)
+    start = time.perf_counter()
+    index = index_from_embeddings(embeddings, spec, settings.EMBED_BATCH_SIZE)
+    return index, time.perf_counter() - start
+
+
+def run(index, queries: np.ndarray, k: int, truth: np.ndarray, params=None) -> dict:
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, I = index.search(q[None, :], k, params=params)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(I[0].tolist()) & set(expected.tolist()))
+    ms = np.array(latencies) * 1000
+    return {
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="sampled chunk queries")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    version = index_store.current()
+    if version is None or not os.path.exists(version.embeddings):
+        ingest_docs()
+        version = index_store.current()
+    embeddings = np.load(version.embeddings, mmap_mode="r")
+    n_rows = len(embeddings)
+
+    rng = np.random.default_rng(42)
+    sample = rng.choice(n_rows, size=min(args.queries, n_rows), replace=False)
+    queries = np.vstack([
+        np.asarray(get_model().encode(QUERIES), dtype=np.float32),
+        np.asarray(embeddings[np.sort(sample)], dtype=np.float32),
+    ])
+
+    results = []
+    flat, build_s = build(embeddings, "flat")
+    _, truth = flat.search(queries, args.k)
+
+    def record(kind, index, build_seconds, knob, value, params):
+        row = {
+            "index": kind,
+            knob: value,
+            "build_s": round(build_seconds, 3),
+            "size_mb": round(len(faiss.serialize_index(index)) / 1e6, 2),
+            **run(index, queries, args.k, truth, params),
+        }
+        results.append(row)
+
+    record("flat", flat, build_s, "param", None, None)
+    for kind, knob, values in (
+        ("hnsw", "ef_search", EF_SEARCH),
+        ("ivf", "nprobe", NPROBE),
+        ("ivfpq", "nprobe", NPROBE),
+    ):
+        index, build_s = build(embeddings, kind)
+        for value in values:
+            params = search_params(index, **{knob: value})
+            record(kind, index, build_s, knob, value, params)
+
+    print(f"{n_rows} chunks, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<8}{'param':>14}{'recall':>9}{'p50 ms':>10}{'p99 ms':>10}{'build s':>9}{'MB':>8}")
+    for r in results:
+        knob = next((f"{key}={r[key]}" for key in ("ef_search", "nprobe") if key in r), "-")
+        print(
+            f"{r['index']:<8}{knob:>14}{r[f'recall@{args.k}']:>9}"
+            f"{r['p50_ms']:>10}{r['p99_ms']:>10}{r['build_s']:>9}{r['size_mb']:>8}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"chunks": n_rows, "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# backend/benchmarks/auth_overhead.py
+"""
+Per-request cost of authentication (get_current_user) before and after
+the user cache.
+
+Run from the backend directory:
+
+    python -m benchmarks.auth_overhead --requests 5000
+
+Uses a throwaway SQLite database. "db lookup" is the previous behaviour
+(decode the JWT, query User every time); "cached" is get_current_user()
+with its TTL cache warm; "claims" is get_current_user() with
+AUTH_TRUST_TOKEN_CLAIMS. Each call is made the way FastAPI makes it:
+sync dependencies on the threadpool, async ones on the event loop.
+"""
+import argparse
+import os
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'auth.db')}"
+
+import asyncio
+import time
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from app.core import deps
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.db.models import User
+from app.db.session import SessionLocal, engine
+
+
+def legacy_current_user(token: str):
+    """get_current_user() as it was: decode, then one query per request."""
+    payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.id == int(payload["sub"])).first()
+    finally:
+        db.close()
+
+
+async def _time(call, n: int) -> np.ndarray:
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1e6
+
+
+async def run(n: int):
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    token = create_access_token(user.id, user.email, user.created_at)
+    db.close()
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    rows = []
+    rows.append(("db lookup", await _time(lambda: run_in_threadpool(legacy_current_user, token), n)))
+    await deps.get_current_user(creds)  # warm the cache
+    rows.append(("cached", await _time(lambda: deps.get_current_user(creds), n)))
+    settings.AUTH_TRUST_TOKEN_CLAIMS = True
+    rows.append(("claims", await _time(lambda: deps.get_current_user(creds), n)))
+    settings.AUTH_TRUST_TOKEN_CLAIMS = False
+
+    print(f"{n} authenticated requests")
+    print(f"{'path':<12}{'p50 µs':>10}{'p99 µs':>10}{'mean µs':>10}")
+    for name, lat in rows:
+        print(f"{name:<12}{np.percentile(lat, 50):>10.0f}{np.percentile(lat, 99):>10.0f}{lat.mean():>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
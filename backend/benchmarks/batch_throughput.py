@@ -0,0 +1,57 @@
+# backend/benchmarks/batch_throughput.py
+"""
+Throughput of retrieve_many() vs looping over retrieve().
+
+Run from the backend directory:
+
+    python -m benchmarks.batch_throughput --queries 1000
+
+Queries are drawn from chunk text so every one is distinct; the two paths
+use disjoint query sets so neither benefits from the other's cached
+embeddings.
+"""
+import argparse
+import time
+import numpy as np
+from app.rag.chunk_store import ChunkStore
+from app.rag.engine import get_engine
+
+
+def make_queries(chunks: ChunkStore, n: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.choice(len(chunks), size=n, replace=len(chunks) < n):
+        words = chunks.text(i).split()
+        start = int(rng.integers(0, max(len(words) - 8, 1)))
+        queries.append(f"{' '.join(words[start:start + 8])} #{len(queries)}")
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = get_engine()
+    loop_queries = make_queries(engine.chunks, args.queries, seed=1)
+    batch_queries = make_queries(engine.chunks, args.queries, seed=2)
+
+    start = time.perf_counter()
+    for q in loop_queries:
+        engine.retrieve(q, args.top_k)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.retrieve_many(batch_queries, args.top_k)
+    batch_s = time.perf_counter() - start
+
+    print(f"{len(engine.chunks)} chunks, {args.queries} queries, top_k={args.top_k}")
+    print(f"{'path':<16}{'seconds':>10}{'QPS':>10}")
+    print(f"{'loop retrieve':<16}{loop_s:>10.2f}{args.queries / loop_s:>10.0f}")
+    print(f"{'retrieve_many':<16}{batch_s:>10.2f}{args.queries / batch_s:>10.0f}")
+    print(f"speedup: {loop_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/benchmarks/chunk_store_load.py
+"""
+Chunk metadata: pickled list of dicts vs the memory-mapped ChunkStore.
+
+Run from the backend directory:
+
+    python -m benchmarks.chunk_store_load --rounds 5
+
+Uses the ingested store (ingesting first if needed) and writes a pickle of
+the same rows to a temp dir, as ingestion used to. Reports load time,
+Python heap held after loading (tracemalloc; the mapped file itself lives
+in the shared page cache, not the heap), file size, and the cost of
+turning 5 row ids into result records the way RetrievalEngine does.
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from app.rag import index_store
+from app.rag.chunk_store import ChunkStore
+from app.rag.ingest import ingest_docs
+from app.rag.retrieve import load_chunks
+
+
+def _load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _measure_load(load, path: str, rounds: int) -> tuple[float, float]:
+    """Median load ms and heap MB held by the loaded object."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        load(path)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    obj = load(path)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return float(np.median(times)) * 1000, held / 1e6
+
+
+def _measure_results(make, n_rows: int, iterations: int = 20000) -> float:
+    """Microseconds to build 5 scored results and read their text."""
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, n_rows, size=(iterations, 5))
+    start = time.perf_counter()
+    for rows in picks:
+        for result in make(rows):
+            result["text"]
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    version = index_store.current()
+    if version is None or not os.path.exists(version.chunks):
+        ingest_docs()
+        version = index_store.current()
+    store = load_chunks(version)
+    n_rows = len(store)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl = os.path.join(tmp, "meta.pkl")
+        with open(pkl, "wb") as f:
+            pickle.dump(store.records(), f)
+
+        pickle_ms, pickle_mb = _measure_load(_load_pickle, pkl, args.rounds)
+        store_ms, store_mb = _measure_load(ChunkStore.open, version.chunks, args.rounds)
+        pickle_size = os.path.getsize(pkl) / 1e6
+
+    metadata = store.records()
+    dict_us = _measure_results(
+        lambda rows: [{**metadata[i], "score": 0.5, "fused_score": 0.01} for i in rows], n_rows
+    )
+    view_us = _measure_results(
+        lambda rows: [store.view(i, score=0.5, fused_score=0.01) for i in rows], n_rows
+    )
+
+    print(f"{n_rows} chunks, {len(set(store.doc_ids))} documents")
+    print(f"{'format':<12}{'load ms':>10}{'heap MB':>10}{'file MB':>10}{'top-5 us':>10}")
+    print(f"{'pickle':<12}{pickle_ms:>10.2f}{pickle_mb:>10.2f}{pickle_size:>10.2f}{dict_us:>10.1f}")
+    print(
+        f"{'chunk store':<12}{store_ms:>10.2f}{store_mb:>10.2f}"
+        f"{os.path.getsize(version.chunks) / 1e6:>10.2f}{view_us:>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
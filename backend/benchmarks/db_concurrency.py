@@ -0,0 +1,132 @@
+# backend/benchmarks/db_concurrency.py
+"""
+Concurrent chat writes: many sessions saving exchanges at the same time.
+
+Run from the backend directory:
+
+    python -m benchmarks.db_concurrency --sessions 32 --exchanges 50
+
+Each session gets its own writer (a thread for the sync engines, a task
+for the async one) calling save_exchange() in a loop against a
+throwaway SQLite file. "default" is a plain engine with SQLite's rollback
+journal; "tuned" is create_db_engine() with WAL, synchronous=NORMAL and
+busy_timeout. Pass --url to run the tuned paths against another database
+(e.g. PostgreSQL); its tables are created but not dropped.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.db.models import User
+from app.db.chat_memory import create_session, save_exchange, save_exchange_async
+from app.db.session import create_async_db_engine, create_db_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+ANSWER = "My young friend, what do you mean by justice? " * 20
+
+
+def _prepare(db_engine, n_sessions: int) -> list[int]:
+    Base.metadata.create_all(db_engine)
+    db = sessionmaker(bind=db_engine)()
+    user = User(email=f"bench-{time.time_ns()}@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    ids = [create_session(db, user.id)["id"] for _ in range(n_sessions)]
+    db.close()
+    return ids
+
+
+def _report(name: str, latencies: list[float], errors: int, wall: float):
+    lat = np.array(latencies or [float("nan")]) * 1000
+    print(
+        f"{name:<10}{len(latencies):>8}{errors:>8}{len(latencies) / wall:>12.0f}"
+        f"{np.percentile(lat, 50):>10.2f}{np.percentile(lat, 99):>10.2f}"
+    )
+
+
+def run_threads(name: str, db_engine, n_sessions: int, exchanges: int):
+    session_ids = _prepare(db_engine, n_sessions)
+    factory = sessionmaker(bind=db_engine, autoflush=False)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def writer(session_id: int):
+        db = factory()
+        local = []
+        for i in range(exchanges):
+            start = time.perf_counter()
+            try:
+                save_exchange(db, session_id, f"What is justice? #{i}", ANSWER)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - start)
+        db.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer, args=(s,)) for s in session_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _report(name, latencies, errors[0], time.perf_counter() - start)
+    db_engine.dispose()
+
+
+async def run_tasks(name: str, url: str, n_sessions: int, exchanges: int):
+    session_ids = _prepare(create_db_engine(url), n_sessions)
+    db_engine = create_async_db_engine(url)
+    factory = async_sessionmaker(db_engine, autoflush=False, expire_on_commit=False)
+    latencies, errors = [], 0
+
+    async def writer(session_id: int):
+        nonlocal errors
+        async with factory() as db:
+            for i in range(exchanges):
+                start = time.perf_counter()
+                try:
+                    await save_exchange_async(db, session_id, f"What is justice? #{i}", ANSWER)
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(s) for s in session_ids))
+    _report(name, latencies, errors, time.perf_counter() - start)
+    await db_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--exchanges", type=int, default=50, help="per session")
+    parser.add_argument("--url", default="", help="database URL for the tuned runs; default: temp SQLite")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} concurrent sessions x {args.exchanges} exchanges")
+    print(f"{'engine':<10}{'ok':>8}{'errors':>8}{'writes/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.url:
+            plain = create_engine(
+                f"sqlite:///{os.path.join(tmp, 'default.db')}",
+                connect_args={"check_same_thread": False},
+            )
+            run_threads("default", plain, args.sessions, args.exchanges)
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'tuned.db')}"
+        run_threads("tuned", create_db_engine(url), args.sessions, args.exchanges)
+        async_target = args.url or f"sqlite:///{os.path.join(tmp, 'tuned_async.db')}"
+        asyncio.run(run_tasks("async", async_target, args.sessions, args.exchanges))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# backend/benchmarks/evaluate.py
+"""
+Retrieval quality and speed per configuration, from a fresh index build.
+
+Run from the backend directory:
+
+    python -m benchmarks.evaluate --json eval.json
+    python -m benchmarks.evaluate --store --indexes flat,hnsw --baseline eval.json
+
+Builds the corpus from app/data/books + app/data/docs in memory
+(extraction, chunking, embedding, BM25), leaving the live vector store
+alone; --store reuses the ingested store instead (ingesting it if
+missing) to skip extraction and embedding. Each FAISS index type is then
+built from the same embeddings and every configuration runs the labelled
+queries in benchmarks/eval_queries.json:
+
+    dense            FAISS only
+    bm25             BM25 only (independent of the index type)
+    hybrid-rrf       RetrievalEngine.retrieve(fusion="rrf")
+    hybrid-weighted  RetrievalEngine.retrieve(fusion="weighted"), as hybrid_retrieve()
+
+Reported per configuration: recall@k and hit@k for each --k, MRR over the
+largest k, p50/p95/p99 latency, single-threaded QPS, the serialized index
+size and the process peak RSS so far. The query embedding cache is cleared
+before every round, so latencies include encoding the question.
+
+--baseline compares against an earlier --json file and exits non-zero
+when recall or MRR of a configuration drops by more than --max-drop.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import unicodedata
+from itertools import chain
+import faiss
+import numpy as np
+from app.core.config import settings, EMBEDDING_MODEL
+from app.rag import index_store
+from app.rag.bm25 import BM25Index, tokenize
+from app.rag.chunk_store import ChunkStore
+from app.rag.engine import RetrievalEngine
+from app.rag.index_factory import INDEX_TYPES, search_params
+from app.rag.ingest import (
+    embed_batches,
+    ingest_docs,
+    ingest_json_docs,
+    ingest_pdf_books,
+    peak_rss_mb,
+    scan_sources,
+)
+from app.rag.query_cache import _get_cache, encode_query
+from app.rag.retrieve import load_index
+from benchmarks.ann_recall import build
+
+QUERY_SET = os.path.join(os.path.dirname(__file__), "eval_queries.json")
+MODES = ("dense", "bm25", "hybrid-rrf", "hybrid-weighted")
+QUALITY_KEYS = ("recall", "mrr")
+
+# Curly quotes and dashes differ between PDF editions; fold them for matching
+_PUNCT = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+
+
+def normalize(text: str) -> str:
+    """NFKC (expands ligatures like "ﬁ"), plain quotes, folded case and spaces."""
+    text = unicodedata.normalize("NFKC", text).translate(_PUNCT)
+    return " ".join(text.casefold().split())
+
+
+def load_queries(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["queries"]
+
+
+def resolve_labels(queries: list[dict], chunks: ChunkStore) -> tuple[list[dict], list[str]]:
+    """
+    Attach the set of relevant chunk rows to each query. Queries whose
+    labels match no chunk (e.g. a phrase now split across two chunks) are
+    returned separately and left out of the scores.
+    """
+    rows_by_doc: dict[str, list[int]] = {}
+    for row in range(len(chunks)):
+        rows_by_doc.setdefault(chunks.doc_id(row), []).append(row)
+
+    resolved, unresolved = [], []
+    for q in queries:
+        relevant = set()
+        for label in q["relevant"]:
+            rows = rows_by_doc.get(label["doc_id"], [])
+            phrase = label.get("phrase")
+            if phrase:
+                phrase = normalize(phrase)
+                rows = [r for r in rows if phrase in normalize(chunks.text(r))]
+            relevant.update(rows)
+        if relevant:
+            resolved.append({**q, "rows": relevant})
+        else:
+            unresolved.append(q["id"])
+    return resolved, unresolved
+
+
+def build_corpus() -> tuple[ChunkStore, np.ndarray, dict]:
+    """Extract, chunk and embed app/data in memory; returns timings too."""
+    sources = scan_sources()
+    start = time.perf_counter()
+    chunks, metadata = [], []
+    for _, file_chunks, file_meta in chain(
+        ingest_json_docs([p for p, kind in sources.values() if kind == "json"]),
+        ingest_pdf_books([p for p, kind in sources.values() if kind == "pdf"]),
+    ):
+        chunks.extend(file_chunks)
+        metadata.extend(file_meta)
+    extract_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = np.vstack(list(embed_batches(chunks, settings.EMBED_BATCH_SIZE)))
+    embed_s = time.perf_counter() - start
+    timings = {"extract_s": round(extract_s, 3), "embed_s": round(embed_s, 3)}
+    return ChunkStore.from_records(metadata), embeddings, timings
+
+
+def load_store() -> tuple[ChunkStore, np.ndarray, dict]:
+    """The ingested store, ingesting first if it is missing."""
+    version = index_store.current()
+    if version is None or not os.path.exists(version.embeddings):
+        ingest_docs()
+        version = index_store.current()
+    _, chunks = load_index(version)
+    embeddings = np.load(version.embeddings, mmap_mode="r")
+    if len(embeddings) != len(chunks):
+        raise RuntimeError("Stored embeddings do not match the chunk store; run ingestion again.")
+    return chunks, embeddings, {"extract_s": None, "embed_s": None}
+
+
+def searcher(engine: RetrievalEngine, mode: str):
+    """Function mapping (query, k) to ranked chunk rows for ``mode``."""
+    if mode == "dense":
+        def search(query, k):
+            _, I = engine.index.search(encode_query(query), k, params=search_params(engine.index))
+            return [int(i) for i in I[0] if i >= 0]
+    elif mode == "bm25":
+        def search(query, k):
+            return engine.bm25.top_k(tokenize(query), k)[0].tolist()
+    else:
+        fusion = mode.split("-", 1)[1]
+
+        def search(query, k):
+            return [r.row for r in engine.retrieve(query, k, fusion=fusion)]
+    return search
+
+
+def evaluate(search, queries: list[dict], ks: list[int], rounds: int) -> dict:
+    depth = max(ks)
+    for q in queries:  # warm-up: FAISS/BM25 buffers, model graph
+        search(q["query"], depth)
+
+    latencies, ranked = [], {}
+    wall = 0.0
+    for _ in range(rounds):
+        _get_cache().clear()
+        for q in queries:
+            start = time.perf_counter()
+            ranked[q["id"]] = search(q["query"], depth)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            wall += elapsed
+
+    out = {}
+    for k in ks:
+        recall = hit = 0.0
+        for q in queries:
+            found = len(q["rows"].intersection(ranked[q["id"]][:k]))
+            recall += found / len(q["rows"])
+            hit += found > 0
+        out[f"recall@{k}"] = round(recall / len(queries), 4)
+        out[f"hit@{k}"] = round(hit / len(queries), 4)
+
+    rr = 0.0
+    for q in queries:
+        rank = next((n for n, row in enumerate(ranked[q["id"]], start=1) if row in q["rows"]), None)
+        rr += 1.0 / rank if rank else 0.0
+    out[f"mrr@{depth}"] = round(rr / len(queries), 4)
+
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    out.update(
+        p50_ms=round(float(p50), 3),
+        p95_ms=round(float(p95), 3),
+        p99_ms=round(float(p99), 3),
+        qps=round(len(latencies) / wall, 1),
+    )
+    return out
+
+
+def compare(results: list[dict], baseline_path: str, max_drop: float) -> list[str]:
+    """Print deltas against a previous run; return the regressed metrics."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["index"], r["mode"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\nvs {baseline_path}")
+    print(f"{'config':<28}{'metric':<12}{'before':>10}{'after':>10}{'delta':>10}")
+    for r in results:
+        old = baseline.get((r["index"], r["mode"]))
+        if old is None:
+            continue
+        name = f"{r['index']}/{r['mode']}"
+        for key in sorted(r):
+            if key not in old or not (key.startswith(QUALITY_KEYS) or key == "p50_ms"):
+                continue
+            delta = r[key] - old[key]
+            flag = ""
+            if key.startswith(QUALITY_KEYS) and delta < -max_drop:
+                flag = "  REGRESSED"
+                regressions.append(f"{name} {key}")
+            print(f"{name:<28}{key:<12}{old[key]:>10}{r[key]:>10}{delta:>+10.4f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", default=QUERY_SET, help="labelled query set (JSON)")
+    parser.add_argument("--indexes", default=",".join(INDEX_TYPES), help=f"subset of {','.join(INDEX_TYPES)}")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"subset of {','.join(MODES)}")
+    parser.add_argument("--k", default="1,5,10", help="cutoffs for recall@k / hit@k")
+    parser.add_argument("--rounds", type=int, default=5, help="timed passes over the query set")
+    parser.add_argument("--store", action="store_true", help="reuse the ingested vector store")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.02, help="allowed recall/MRR drop vs --baseline")
+    args = parser.parse_args()
+
+    indexes = [i.strip() for i in args.indexes.split(",") if i.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    ks = sorted({int(k) for k in args.k.split(",")})
+    for name, values, allowed in (("index", indexes, INDEX_TYPES), ("mode", modes, MODES)):
+        unknown = set(values) - set(allowed)
+        if unknown:
+            parser.error(f"unknown {name} {sorted(unknown)}; expected {allowed}")
+
+    # Stage timings are logged per query otherwise
+    logging.getLogger("socrates").setLevel(logging.WARNING)
+
+    chunks, embeddings, build_info = load_store() if args.store else build_corpus()
+    start = time.perf_counter()
+    bm25 = BM25Index.build(chunks.texts())
+    build_info["bm25_s"] = round(time.perf_counter() - start, 3)
+    build_info["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    queries, unresolved = resolve_labels(load_queries(args.queries), chunks)
+    if unresolved:
+        print(f"⚠️ Labels match no chunk, skipped: {', '.join(unresolved)}")
+    if not queries:
+        sys.exit("No query has a resolvable label.")
+
+    results = []
+    for kind in indexes:
+        index, build_s = build(embeddings, kind)
+        engine = RetrievalEngine(index, chunks, bm25, embeddings)
+        size_mb = round(len(faiss.serialize_index(index)) / 1e6, 2)
+        for mode in modes:
+            if mode == "bm25" and kind != indexes[0]:
+                continue  # does not touch FAISS; measured once
+            row = {
+                "index": "-" if mode == "bm25" else kind,
+                "mode": mode,
+                "build_s": None if mode == "bm25" else round(build_s, 3),
+                "size_mb": None if mode == "bm25" else size_mb,
+                **evaluate(searcher(engine, mode), queries, ks, args.rounds),
+            }
+            row["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            results.append(row)
+
+    depth = max(ks)
+    print(
+        f"\n{len(chunks)} chunks, {len(queries)} labelled queries x {args.rounds} rounds, "
+        f"model {EMBEDDING_MODEL}"
+    )
+    print(
+        "build: "
+        + ", ".join(f"{key} {value}" for key, value in build_info.items() if value is not None)
+    )
+    header = f"{'index':<8}{'mode':<17}" + "".join(f"{f'R@{k}':>8}" for k in ks)
+    print(header + f"{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'QPS':>8}{'build s':>9}{'MB':>8}{'RSS MB':>8}")
+    for r in results:
+        print(
+            f"{r['index']:<8}{r['mode']:<17}"
+            + "".join(f"{r[f'recall@{k}']:>8}" for k in ks)
+            + f"{r[f'mrr@{depth}']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['qps']:>8}"
+            f"{r['build_s'] if r['build_s'] is not None else '-':>9}"
+            f"{r['size_mb'] if r['size_mb'] is not None else '-':>8}{r['peak_rss_mb']:>8}"
+        )
+
+    if args.json:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "corpus": {
+                "chunks": len(chunks),
+                "docs": len(set(chunks.doc_ids)),
+                "source": "store" if args.store else "fresh",
+            },
+            "model": EMBEDDING_MODEL,
+            "dim": int(embeddings.shape[1]),
+            "queries": len(queries),
+            "unresolved": unresolved,
+            "rounds": args.rounds,
+            "k": ks,
+            "settings": {
+                key: getattr(settings, key)
+                for key in (
+                    "RETRIEVAL_CANDIDATES", "FUSION_ALPHA", "RRF_K", "HNSW_M", "HNSW_EF_CONSTRUCTION",
+                    "HNSW_EF_SEARCH", "IVF_NLIST", "IVF_NPROBE", "PQ_M", "PQ_NBITS",
+                )
+            },
+            "platform": {"python": platform.python_version(), "faiss": faiss.__version__, "cpus": os.cpu_count()},
+            "build": build_info,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_drop)
+        if regressions:
+            sys.exit(f"Quality regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# backend/benchmarks/exchange_write.py
+"""
+Write latency of one chat exchange: save_message() twice vs save_exchange().
+
+Run from the backend directory:
+
+    python -m benchmarks.exchange_write --exchanges 500
+
+Uses a throwaway SQLite file. The session is pre-filled to MAX_MESSAGES
+so every write also prunes, as it does for any long-running chat.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.db.models import User, ChatMessage
+from app.db.chat_memory import MAX_MESSAGES, create_session, save_exchange, save_message
+
+ANSWER = "My young friend, what do you mean by justice? " * 20
+
+
+def _setup(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    user = User(email="bench@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    session_id = create_session(db, user.id)["id"]
+    for i in range(MAX_MESSAGES):
+        db.add(ChatMessage(session_id=session_id, role="user" if i % 2 == 0 else "assistant", content=ANSWER))
+    db.commit()
+    return engine, db, session_id
+
+
+def _two_saves(db, session_id: int, i: int):
+    save_message(db, session_id, "user", f"What is justice? #{i}")
+    save_message(db, session_id, "assistant", ANSWER)
+
+
+def _one_exchange(db, session_id: int, i: int):
+    save_exchange(db, session_id, f"What is justice? #{i}", ANSWER)
+
+
+def _measure(write, exchanges: int) -> tuple[np.ndarray, int]:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db, session_id = _setup(os.path.join(tmp, "bench.db"))
+        latencies = []
+        for i in range(exchanges):
+            start = time.perf_counter()
+            write(db, session_id, i)
+            latencies.append(time.perf_counter() - start)
+        remaining = db.query(ChatMessage).filter(ChatMessage.session_id == session_id).count()
+        db.close()
+        engine.dispose()
+    return np.array(latencies) * 1000, remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--exchanges", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.exchanges} exchanges, session pre-filled to {MAX_MESSAGES} messages")
+    print(f"{'path':<16}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'kept':>8}")
+    for name, write in (("save_message x2", _two_saves), ("save_exchange", _one_exchange)):
+        lat, kept = _measure(write, args.exchanges)
+        print(
+            f"{name:<16}{np.percentile(lat, 50):>10.2f}{np.percentile(lat, 99):>10.2f}"
+            f"{lat.mean():>10.2f}{kept:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
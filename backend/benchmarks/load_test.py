@@ -0,0 +1,106 @@
+# backend/benchmarks/load_test.py
+"""
+Concurrent /rag/ask load test against a running API.
+
+Start the LLM stub and point the API at it so Groq is out of the picture:
+
+    python -m benchmarks.stub_llm --port 9000 --delay 0.5
+    GROQ_BASE_URL=http://127.0.0.1:9000 uvicorn app.main:app --port 8000
+
+then, from the backend directory:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 1 8 32 64
+
+Every request uses its own chat session, so history loading and message
+writes are exercised too. For "before" numbers, check out the previous
+revision, start the API the same way and rerun.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+import httpx
+import numpy as np
+
+QUERIES = [
+    "What is the Socratic method?",
+    "How does Plato describe the theory of forms?",
+    "What did Aristotle say about virtue?",
+    "Explain the allegory of the cave",
+]
+
+
+async def _login(client: httpx.AsyncClient) -> dict:
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    password = "load-test-password"
+    r = await client.post("/auth/signup", json={"email": email, "password": password})
+    r.raise_for_status()
+    r = await client.post("/auth/login", json={"email": email, "password": password})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def _run_level(client: httpx.AsyncClient, headers: dict, concurrency: int, requests: int, path: str) -> dict:
+    sessions = []
+    for _ in range(concurrency):
+        r = await client.post("/rag/create_session", json={"title": "load test"}, headers=headers)
+        r.raise_for_status()
+        sessions.append(r.json()["id"])
+
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker(session_id: int):
+        nonlocal errors
+        for i in counter:
+            payload = {"query": QUERIES[i % len(QUERIES)], "session_id": session_id}
+            start = time.perf_counter()
+            try:
+                r = await client.post(path, json=payload, headers=headers)
+                r.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(s) for s in sessions))
+    wall = time.perf_counter() - start
+
+    lat = np.array(latencies or [float("nan")]) * 1000
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 8)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        headers = await _login(client)
+        print(f"{'conc':>6}{'ok':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for level in args.concurrency:
+            row = await _run_level(client, headers, level, args.requests or level * 10, args.path)
+            print(
+                f"{row['concurrency']:>6}{row['ok']:>8}{row['errors']:>6}"
+                f"{row['rps']:>10.1f}{row['p50_ms']:>10.0f}{row['p99_ms']:>10.0f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/rag/ask", help="/rag/ask or /rag/ask/stream")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=0, help="per level; default 10x concurrency")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
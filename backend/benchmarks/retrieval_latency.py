@@ -0,0 +1,87 @@
+# backend/benchmarks/retrieval_latency.py
+"""
+Retrieval latency: per-request index loading vs the resident RetrievalEngine.
+
+Run from the backend directory:
+
+    python -m benchmarks.retrieval_latency --rounds 20
+
+Builds the vector store from app/data (Republic, Gorgias, Symposium, ...)
+if it does not exist yet, then times the same query set through both paths
+and prints p50/p99 latency in milliseconds.
+"""
+import argparse
+import time
+import numpy as np
+from app.rag import index_store
+from app.rag.ingest import ingest_docs
+from rank_bm25 import BM25Okapi
+from app.rag.retrieve import load_index
+from app.rag.model import get_model
+from app.rag.engine import reload_engine
+
+QUERIES = [
+    "What is justice?",
+    "Is it better to suffer injustice than to commit it?",
+    "What is the nature of love according to Diotima?",
+    "Why does Socrates claim to know nothing?",
+    "What is rhetoric and is it an art?",
+    "Describe the allegory of the cave",
+    "Who should rule the ideal city?",
+    "What did the oracle at Delphi say about Socrates?",
+    "Is pleasure the same as the good?",
+    "What is the role of the guardians?",
+]
+
+
+def legacy_retrieve(query: str, top_k: int = 5):
+    """The pre-engine request path: reload everything, then search."""
+    index, chunks = load_index()
+    vec = get_model().encode([query])
+    index.search(np.array(vec), top_k)
+    bm25 = BM25Okapi([text.split() for text in chunks.texts()])
+    scores = bm25.get_scores(query.split())
+    return np.argsort(scores)[::-1][:top_k]
+
+
+def percentiles(samples: list[float]) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+
+def time_queries(fn, rounds: int, top_k: int) -> list[float]:
+    samples = []
+    for _ in range(rounds):
+        for q in QUERIES:
+            start = time.perf_counter()
+            fn(q, top_k)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if index_store.current() is None:
+        ingest_docs()
+
+    engine = reload_engine()
+    print(f"Corpus: {len(engine.chunks)} chunks")
+
+    before = percentiles(time_queries(legacy_retrieve, args.rounds, args.top_k))
+    after = percentiles(time_queries(engine.retrieve, args.rounds, args.top_k))
+
+    print(f"{'path':<10}{'p50 (ms)':>12}{'p99 (ms)':>12}{'mean (ms)':>12}")
+    for name, stats in (("before", before), ("after", after)):
+        print(f"{name:<10}{stats['p50_ms']:>12}{stats['p99_ms']:>12}{stats['mean_ms']:>12}")
+
+
+if __name__ == "__main__":
+    main()
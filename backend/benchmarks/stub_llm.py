@@ -0,0 +1,89 @@
+# backend/benchmarks/stub_llm.py
+"""
+Stand-in for the Groq chat completions endpoint with a fixed delay.
+
+Lets load tests measure the server's own concurrency instead of Groq's
+rate limits. Run from the backend directory:
+
+    python -m benchmarks.stub_llm --port 9000 --delay 0.5
+
+and start the API with GROQ_BASE_URL=http://127.0.0.1:9000.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ANSWER = "This is a canned answer from the benchmark LLM stub."
+
+app = FastAPI()
+app.state.delay = 0.5
+
+
+def _completion(model: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": ANSWER},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _chunk(cid: str, model: str, delta: dict, finish: str | None = None) -> str:
+    payload = {
+        "id": cid,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    delay = app.state.delay
+
+    if not body.get("stream"):
+        await asyncio.sleep(delay)
+        return _completion(model)
+
+    async def events():
+        cid = f"chatcmpl-{uuid.uuid4().hex}"
+        words = ANSWER.split(" ")
+        # Half the delay before the first token, the rest spread over the answer
+        await asyncio.sleep(delay / 2)
+        for i, word in enumerate(words):
+            yield _chunk(cid, model, {"content": word if i == 0 else f" {word}"})
+            await asyncio.sleep(delay / 2 / len(words))
+        yield _chunk(cid, model, {}, finish="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds per completion")
+    args = parser.parse_args()
+
+    app.state.delay = args.delay
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
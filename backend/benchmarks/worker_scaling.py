@@ -0,0 +1,200 @@
+# backend/benchmarks/worker_scaling.py
+"""
+Memory per worker and retrieval throughput vs gunicorn worker count.
+
+Run from the backend directory (Linux; reads /proc for memory):
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --concurrency 32
+
+For every worker count and mode ("preload": gunicorn.conf.py as shipped,
+workers forked from a warmed-up master; "no-preload": every worker loads
+its own model, index and chunk store), a server is started on a free
+port with a throwaway SQLite database. Then:
+
+1. It waits for /ready.
+2. It drives /rag/retrieve/batch with one query per request from --concurrency clients.
+3. It reads each worker's memory:
+   - RSS: resident pages, shared ones included.
+   - PSS: shared pages split between the processes that map them.
+   - USS: pages private to the worker.
+
+PSS summed over master + workers is the real footprint of the deployment.
+Queries are drawn from chunk text so the per-worker query caches rarely
+hit. The vector store is ingested first if it does not exist.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import httpx
+import numpy as np
+from app.rag import index_store
+from app.rag.ingest import ingest_docs
+from app.rag.retrieve import load_chunks
+from benchmarks.batch_throughput import make_queries
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _memory_mb(pid: int) -> dict:
+    """RSS / PSS / USS of one process from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def _children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _start_server(workers: int, preload: bool, port: int, db_path: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_PRELOAD": "1" if preload else "0",
+        "BIND": f"127.0.0.1:{port}",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "LOG_LEVEL": "warning",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, workers: int, timeout: float):
+    """/ready must answer 200 many times in a row, i.e. from every worker."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not become ready")
+        try:
+            r = await client.get("/ready")
+            streak = streak + 1 if r.status_code == 200 else 0
+        except httpx.HTTPError:
+            streak = 0
+        if not streak:
+            await asyncio.sleep(0.5)
+
+
+async def _drive(client: httpx.AsyncClient, queries: list[str], concurrency: int) -> dict:
+    email = f"scale-{uuid.uuid4().hex[:12]}@example.com"
+    creds = {"email": email, "password": "worker-scaling-password"}
+    (await client.post("/auth/signup", json=creds)).raise_for_status()
+    r = await client.post("/auth/login", json=creds)
+    r.raise_for_status()
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(queries)
+
+    async def worker():
+        nonlocal errors
+        for q in pending:
+            start = time.perf_counter()
+            try:
+                r = await client.post("/rag/retrieve/batch", json={"queries": [q], "top_k": 5}, headers=headers)
+                r.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    lat = np.array(latencies or [float("nan")]) * 1000
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+async def measure(workers: int, preload: bool, queries: list[str], concurrency: int, timeout: float) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(workers, preload, port, os.path.join(tmp, "bench.db"))
+        try:
+            limits = httpx.Limits(max_connections=concurrency + 8)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", timeout=60.0, limits=limits
+            ) as client:
+                await _wait_ready(client, workers, timeout)
+                load = await _drive(client, queries, concurrency)
+            master = _memory_mb(server.pid)
+            per_worker = [_memory_mb(pid) for pid in _children(server.pid)]
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=30)
+
+    return {
+        "workers": workers,
+        "mode": "preload" if preload else "no-preload",
+        **load,
+        "rss": np.mean([m["rss"] for m in per_worker]),
+        "pss": np.mean([m["pss"] for m in per_worker]),
+        "uss": np.mean([m["uss"] for m in per_worker]),
+        "total_pss": master["pss"] + sum(m["pss"] for m in per_worker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "no-preload"], default=["preload", "no-preload"])
+    parser.add_argument("--requests", type=int, default=2000, help="per run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="seconds to wait for warmup")
+    args = parser.parse_args()
+
+    if index_store.current() is None:
+        ingest_docs()
+    chunks = load_chunks()
+
+    print(f"{args.requests} requests per run, {args.concurrency} concurrent clients, {os.cpu_count()} CPUs")
+    print(
+        f"{'workers':>8} {'mode':<11}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'err':>6}"
+        f"{'RSS/w MB':>10}{'PSS/w MB':>10}{'USS/w MB':>10}{'total PSS':>11}"
+    )
+    for n, workers in enumerate(args.workers):
+        for mode in args.modes:
+            queries = make_queries(chunks, args.requests, seed=100 + n)
+            r = asyncio.run(measure(workers, mode == "preload", queries, args.concurrency, args.ready_timeout))
+            print(
+                f"{r['workers']:>8} {r['mode']:<11}{r['rps']:>9.0f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                f"{r['errors']:>6}{r['rss']:>10.0f}{r['pss']:>10.0f}{r['uss']:>10.0f}{r['total_pss']:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
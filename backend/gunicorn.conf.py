@@ -0,0 +1,35 @@
+# backend/gunicorn.conf.py
+"""
+Multi-worker serving. From the backend directory:
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported and warmed up once in the master (model, ingestion,
+FAISS index, chunk store, BM25) and the workers are forked from it, so
+read-only data is shared instead of loaded N times. See app.main.preload.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# Warmup happens before the fork, so workers boot in well under this
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+accesslog = "-"
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported, before any worker forks
+    if server.cfg.preload_app:
+        from app.main import preload
+        preload()
+
+
+def post_fork(server, worker):
+    from app.main import after_fork
+    after_fork(server.cfg.workers)
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+# Settings requires these; tests never call Groq or issue real tokens
+import os
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
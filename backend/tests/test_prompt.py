@@ -0,0 +1,21 @@
+# backend/tests/test_prompt.py
+from app.rag.prompt import dedupe_chunks
+
+LONG = " ".join(f"word{i}" for i in range(40))
+
+
+def test_short_unique_chunk_is_kept():
+    short = "Sopackages was born in Athens."
+    assert dedupe_chunks([short, LONG]) == [short, LONG]
+
+
+def test_overlap_with_previous_chunk_is_stripped():
+    words = LONG.split()
+    following = " ".join(words[20:] + [f"next{i}" for i in range(20)])
+    assert dedupe_chunks([LONG, following]) == [LONG, " ".join(f"next{i}" for i in range(20))]
+
+
+def test_chunk_reduced_to_a_tiny_remainder_is_dropped():
+    words = LONG.split()
+    following = " ".join(words[20:] + ["tail"])
+    assert dedupe_chunks([LONG, following]) == [LONG]
@@ -0,0 +1,15 @@
+# backend/tests/test_summary.py
+from app.core.config import settings
+from app.rag.summary import history_window
+
+
+def test_history_window_covers_unsummarized_messages(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_RECENT_MESSAGES", 6)
+    monkeypatch.setattr(settings, "SUMMARY_TRIGGER_MESSAGES", 8)
+    assert history_window() == 14
+
+
+def test_history_window_when_summaries_are_off(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_TRIGGER_MESSAGES", 0)
+    monkeypatch.setattr(settings, "HISTORY_MESSAGES", 20)
+    assert history_window() == 20
@@ -18,8 +18,13 @@ mkdir -p backend/app/data
 
 
 echo "Launching API..."
-uvicorn backend.app.main:app \
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  # Workers are forked from a warmed-up master and share the model,
+  # the memory-mapped FAISS index and the chunk store
+  exec gunicorn -c backend/gunicorn.conf.py app.main:app
+fi
+
+exec uvicorn backend.app.main:app \
   --host 0.0.0.0 \
   --port 8000 \
-  --reload
   --log-level info